@@ -0,0 +1,263 @@
+from blokus.gamestate import *
+import random
+import tracemalloc
+from copy import deepcopy
+import numpy as np
+from encoding import *
+import time
+import sys
+
+def reference_get_possible_actions(state):
+    possible_actions = []
+    own_fields = state.board[state.current_color.value]
+    other_fields = state.get_occupied_fields() & ~own_fields
+    legal_fields = ~(own_fields | other_fields | own_fields.neighbours()) & VALID_FIELDS
+    if state.ply > 3:
+        placement_fields = own_fields.diagonal_neighbours() & legal_fields
+    else:
+        placement_fields = START_FIELDS & ~other_fields
+
+    for piece_type in PIECE_TABLE:
+        if not state.pieces_left[piece_type[0].value][state.current_color.value]:
+            continue
+        candidates = placement_fields.clone()
+        for candidate_field in candidates:
+            shape = piece_type[2]
+            for offsets in piece_type[1]:
+                for offset in offsets:
+                    if candidate_field >= offset:
+                        destination = candidate_field - offset
+                        piece = Bitboard.with_piece(destination, shape)
+                        if piece & legal_fields == piece:
+                            possible_actions.append(Action(destination, shape))
+                shape += 1
+
+    if state.pieces_left[PieceType.Monomino.value][state.current_color.value]:
+        for destination in placement_fields:
+            possible_actions.append(Action(destination, 0))
+
+    if state.ply < 4:
+        return [action for action in possible_actions if action.piece_type == state.start_piece_type]
+    if len(possible_actions) != 0:
+        return possible_actions
+    return [None]
+
+def reference_fields(state):
+    occupied = state.get_occupied_fields()
+    legal_fields = []
+    placement_fields = []
+    for color in range(4):
+        own_fields = state.board[color]
+        legal = ~(occupied | own_fields.neighbours()) & VALID_FIELDS
+        legal_fields.append(legal.fields)
+        placement_fields.append((own_fields.diagonal_neighbours() & legal).fields)
+    return legal_fields, placement_fields
+
+def validate_incremental_updates(games, seed=0):
+    random.seed(seed)
+    for _ in range(games):
+        state = GameState()
+        actions = []
+        while not state.is_game_over():
+            action = random.choice(state.get_possible_actions())
+            state.do_action(action)
+            actions.append(action)
+            assert (state.legal_fields, state.placement_fields) == reference_fields(state), state.to_fen()
+            assert state.hash == hash_state(state), state.to_fen()
+        for action in reversed(actions):
+            state.undo_action(action)
+            assert (state.legal_fields, state.placement_fields) == reference_fields(state), state.to_fen()
+            assert state.hash == hash_state(state), state.to_fen()
+    print(f"incremental updates: {games} games consistent")
+
+def reference_count_ones(board):
+    ones = 0
+    bit = 1
+    board_copy = board.fields
+    while board_copy != 0:
+        if bit & board_copy != 0:
+            ones += 1
+            board_copy ^= bit
+        bit <<= 1
+    return ones
+
+def reference_trailing_zeros(board):
+    bit = 1
+    for i in range(512):
+        if bit & board.fields == bit:
+            return i
+        bit <<= 1
+    return 512
+
+def reference_indices(board):
+    board = board.clone()
+    indices = []
+    while True:
+        bit_index = reference_trailing_zeros(board)
+        if bit_index == 512:
+            return indices
+        board.flip_bit(bit_index)
+        indices.append(bit_index)
+
+def reference_flip(board):
+    result = Bitboard()
+    for row in range(20):
+        result |= (board >> (21 * row) & ROW_MASK) << ((19 - row) * 21)
+    return result
+
+def reference_mirror(board):
+    result = Bitboard()
+    for col in range(20):
+        result |= ((board >> col) & COLUMN_MASK) << (19 - col)
+    return result
+
+def reference_mirror_diagonal(board):
+    result = Bitboard()
+    for x in range(20):
+        for y in range(20):
+            if board.check_bit(x + y * 21):
+                result.flip_bit(y + x * 21)
+    return result
+
+REFERENCE_SYMMETRIES = [
+    lambda board: board.clone(),
+    reference_mirror,
+    reference_flip,
+    lambda board: reference_mirror(reference_flip(board)),
+    reference_mirror_diagonal,
+    lambda board: reference_mirror(reference_mirror_diagonal(board)),
+    lambda board: reference_flip(reference_mirror_diagonal(board)),
+    lambda board: reference_mirror(reference_flip(reference_mirror_diagonal(board))),
+]
+
+def reference_state_to_input(state):
+    inp = np.zeros(shape=INPUT_SHAPE)
+    board = Bitboard()
+    for action in state.get_possible_actions():
+        if action != None:
+            board |= Bitboard.with_piece(action.destination, action.shape)
+    for field_index in board:
+        x, y = convert(field_index)
+        inp[x][y][4] = 1
+    index = 0
+    for color in [(state.current_color.value + i) % 4 for i in range(4)]:
+        for field_index in state.board[color].clone():
+            x, y = convert(field_index)
+            inp[x][y][index] = 1.0
+        index += 1
+    return inp
+
+def reference_score_moves(moves, out):
+    scores = []
+    for move in moves:
+        score = 0
+        for field_index in Bitboard.with_piece(move >> 7, move & 0b1111111):
+            x, y = convert(field_index)
+            score += out[(x + y * 20)]
+        scores.append(score)
+    return scores
+
+def random_positions(n, seed=0):
+    random.seed(seed)
+    return [GameState.random(random.randint(0, 60)) for _ in range(n)]
+
+def measure(function, positions, repetitions=1):
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        for state in positions:
+            function(state)
+    return time.perf_counter() - start
+
+def benchmark_move_generation(positions):
+    for state in positions:
+        assert state.get_possible_actions() == reference_get_possible_actions(state), state.to_fen()
+    old = measure(reference_get_possible_actions, positions)
+    new = measure(GameState.get_possible_actions, positions)
+    print(f"get_possible_actions: {len(positions) / old:.1f} -> {len(positions) / new:.1f} positions/s ({old / new:.2f}x)")
+    packed = measure(GameState.get_possible_moves, positions)
+    print(f"get_possible_moves: {len(positions) / packed:.1f} positions/s ({old / packed:.2f}x)")
+
+def benchmark_bit_operations(positions):
+    boards = [board for state in positions for board in state.board[:4]]
+    for board in boards:
+        assert board.count_ones() == reference_count_ones(board)
+        assert board.trailing_zeros() == reference_trailing_zeros(board)
+        assert board.indices() == reference_indices(board) == list(board.clone())
+    for name, old_function, new_function in [
+        ("count_ones", reference_count_ones, Bitboard.count_ones),
+        ("trailing_zeros", reference_trailing_zeros, Bitboard.trailing_zeros),
+        ("indices", reference_indices, Bitboard.indices),
+    ]:
+        old = measure(old_function, boards)
+        new = measure(new_function, boards)
+        print(f"{name}: {len(boards) / old:.1f} -> {len(boards) / new:.1f} boards/s ({old / new:.2f}x)")
+
+def benchmark_symmetries(boards=1000, seed=0):
+    random.seed(seed)
+    boards = [Bitboard(random.getrandbits(420)) & VALID_FIELDS for _ in range(boards)]
+    for board in boards:
+        assert board.flip() == reference_flip(board)
+        assert board.mirror() == reference_mirror(board)
+        assert board.mirror_diagonal() == reference_mirror_diagonal(board)
+        assert board.rotate_left() == reference_flip(reference_mirror_diagonal(board))
+        assert board.rotate_right() == reference_mirror(reference_mirror_diagonal(board))
+    for symmetry, reference in enumerate(REFERENCE_SYMMETRIES):
+        expected = [reference(board) for board in boards]
+        assert [board.transform(symmetry) for board in boards] == expected
+        for i in range(0, len(boards), 4):
+            assert transform_boards(boards[i:i + 4], symmetry) == expected[i:i + 4]
+        old = measure(reference, boards)
+        new = measure(lambda board: board.transform(symmetry), boards)
+        batched = measure(lambda i: transform_boards(boards[i:i + 4], symmetry), range(0, len(boards), 4))
+        print(f"symmetry {symmetry}: {len(boards) / old:.1f} -> {len(boards) / new:.1f} boards/s ({old / new:.2f}x), batched {len(boards) / batched:.1f} boards/s")
+
+def benchmark_encoding(positions):
+    batch = states_to_input(positions)
+    for state, inp in zip(positions, batch):
+        assert np.array_equal(reference_state_to_input(state), inp)
+        assert np.array_equal(state_to_input(state), inp)
+    old = measure(reference_state_to_input, positions)
+    new = measure(state_to_input, positions)
+    start = time.perf_counter()
+    states_to_input(positions)
+    batched = time.perf_counter() - start
+    print(f"state_to_input: {len(positions) / old:.1f} -> {len(positions) / new:.1f} states/s ({old / new:.2f}x), batched {len(positions) / batched:.1f} states/s")
+
+def benchmark_scoring(positions, seed=0):
+    rng = np.random.default_rng(seed)
+    samples = [(moves, rng.random(400, dtype=np.float32)) for moves in map(GameState.get_possible_moves, positions) if moves[0] != 0xFFFF]
+    for moves, out in samples:
+        assert np.allclose(score_moves(moves, out), reference_score_moves(moves, out), atol=1e-5)
+    old = measure(lambda sample: reference_score_moves(*sample), samples)
+    new = measure(lambda sample: score_moves(*sample), samples)
+    n = sum(len(moves) for moves, _ in samples)
+    print(f"score_moves: {n / old:.1f} -> {n / new:.1f} moves/s ({old / new:.2f}x)")
+
+def allocations(function, positions):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    results = [function(state) for state in positions]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    statistics = after.compare_to(before, "filename")
+    return results, sum(stat.size_diff for stat in statistics), sum(stat.count_diff for stat in statistics)
+
+def benchmark_memory(positions):
+    actions, size, count = allocations(GameState.get_possible_actions, positions)
+    n = sum(len(possible_actions) for possible_actions in actions)
+    print(f"get_possible_actions: {count / n:.2f} objects, {size / n:.1f} bytes per move")
+    moves, size, count = allocations(GameState.get_possible_moves, positions)
+    n = sum(len(possible_moves) for possible_moves in moves)
+    print(f"get_possible_moves: {count / n:.2f} objects, {size / n:.1f} bytes per move")
+    states, size, count = allocations(deepcopy, positions)
+    print(f"GameState: {count / len(positions):.1f} objects, {size / len(positions):.1f} bytes per state")
+
+if __name__ == "__main__":
+    validate_incremental_updates(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
+    positions = random_positions(200)
+    benchmark_move_generation(positions)
+    benchmark_bit_operations(positions)
+    benchmark_symmetries()
+    benchmark_encoding(positions)
+    benchmark_scoring(positions)
+    benchmark_memory(positions)
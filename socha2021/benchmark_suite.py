@@ -0,0 +1,159 @@
+from encoding import *
+from copy import deepcopy
+import argparse
+import platform
+import random
+import json
+import time
+import sys
+
+# Times the hot paths on a fixed corpus of seeded positions and writes the results as JSON.
+# "--compare baseline.json" flags every benchmark that got slower than the threshold.
+PHASES = {"opening": (4, 12), "midgame": (24, 44), "endgame": (52, 76)}
+MIN_SAMPLE_SECONDS = 20e-6
+
+def random_position(first_ply: int, last_ply: int) -> GameState:
+    # Positions where the color to move has to skip are drawn again
+    while True:
+        state = GameState.random(random.randint(first_ply, last_ply))
+        if state.get_possible_moves()[0] != 0xFFFF:
+            return state
+
+def build_corpus(positions_per_phase=50, seed=2021) -> dict:
+    random.seed(seed)
+    corpus = {}
+    for phase, (first_ply, last_ply) in PHASES.items():
+        corpus[phase] = [random_position(first_ply, last_ply) for _ in range(positions_per_phase)]
+    return corpus
+
+def dataset_line(state, rng) -> str:
+    # Same layout as the lines dataset.py writes, with random values
+    moves = state.get_possible_moves()
+    return state.to_fen() + "".join(f" {move} {rng.random():.4f}" for move in moves)
+
+def benchmarks(corpus: dict, seed=2021) -> list:
+    rng = random.Random(seed)
+    cases = []
+    for phase, states in corpus.items():
+        boards = [board for state in states for board in state.board[:4]]
+        fens = [state.to_fen() for state in states]
+        hex_fens = [state.to_hex_fen() for state in states]
+        lines = [dataset_line(state, rng) for state in states]
+        moves = [state.get_possible_moves() for state in states]
+        out_rng = np.random.default_rng(seed)
+        outs = [out_rng.random(400, dtype=np.float32) for _ in states]
+
+        def do_undo(state):
+            action = Action.deserialize(state.get_possible_moves()[0])
+            state.do_action(action)
+            state.undo_action(action)
+
+        cases += [
+            (f"count_ones/{phase}", Bitboard.count_ones, boards),
+            (f"indices/{phase}", Bitboard.indices, boards),
+            (f"transform/{phase}", lambda board: board.transform(5), boards),
+            (f"get_possible_actions/{phase}", GameState.get_possible_actions, states),
+            (f"get_possible_moves/{phase}", GameState.get_possible_moves, states),
+            (f"do_undo_action/{phase}", do_undo, [deepcopy(state) for state in states]),
+            (f"load_fen/{phase}", GameState, fens),
+            (f"to_fen/{phase}", GameState.to_fen, states),
+            (f"load_hex_fen/{phase}", GameState, hex_fens),
+            (f"to_hex_fen/{phase}", GameState.to_hex_fen, states),
+            (f"fen_lines_to_arrays/{phase}", lambda line: fen_lines_to_arrays([line]), lines),
+            (f"state_to_input/{phase}", state_to_input, states),
+            (f"score_moves/{phase}", lambda sample: score_moves(*sample), list(zip(moves, outs))),
+            (f"to_example/{phase}", to_example, lines),
+        ]
+    return cases
+
+def repetitions(function, argument) -> int:
+    # Repeats fast calls so that the timer resolution does not dominate a sample
+    n = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(n):
+            function(argument)
+        if time.perf_counter() - start >= MIN_SAMPLE_SECONDS:
+            return n
+        n *= 2
+
+def percentile(values: list, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+def run(function, arguments: list, rounds: int) -> dict:
+    n = repetitions(function, arguments[0])
+    samples = []
+    total_calls = 0
+    total_seconds = 0.0
+    for _ in range(rounds):
+        for argument in arguments:
+            start = time.perf_counter()
+            for _ in range(n):
+                function(argument)
+            elapsed = time.perf_counter() - start
+            samples.append(elapsed / n)
+            total_calls += n
+            total_seconds += elapsed
+    return {
+        "ops_per_sec": total_calls / total_seconds,
+        "p50_us": percentile(samples, 50) * 1e6,
+        "p99_us": percentile(samples, 99) * 1e6,
+        "samples": len(samples),
+    }
+
+def run_suite(positions_per_phase=50, seed=2021, rounds=3, name_filter=None) -> dict:
+    corpus = build_corpus(positions_per_phase, seed)
+    results = {}
+    for name, function, arguments in benchmarks(corpus, seed):
+        if name_filter is not None and name_filter not in name:
+            continue
+        results[name] = run(function, arguments, rounds)
+        result = results[name]
+        print(f"{name:<32} {result['ops_per_sec']:>14.1f} ops/s  p50 {result['p50_us']:>10.2f}us  p99 {result['p99_us']:>10.2f}us", flush=True)
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.time(),
+        "corpus": {"positions_per_phase": positions_per_phase, "seed": seed, "rounds": rounds},
+        "results": results,
+    }
+
+# Compares the medians, they are less sensitive to other load on the machine than the means
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    regressions = []
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        ratio = baseline["results"][name]["p50_us"] / result["p50_us"]
+        flag = "REGRESSION" if ratio < 1 - threshold else ""
+        print(f"{name:<32} {ratio:>6.2f}x {flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file written by an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown before a benchmark is flagged")
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this")
+    parser.add_argument("--positions", type=int, default=50, help="positions per phase")
+    parser.add_argument("--seed", type=int, default=2021)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    if args.compare is not None:
+        with open(args.compare, "r") as file:
+            baseline = json.load(file)
+        corpus = baseline["corpus"]
+        if (corpus["positions_per_phase"], corpus["seed"]) != (args.positions, args.seed):
+            print("warning: the baseline was measured on a different corpus")
+    results = run_suite(args.positions, args.seed, args.rounds, args.filter)
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+    if args.compare is not None:
+        regressions = compare(baseline, results, args.threshold)
+        if len(regressions) != 0:
+            print(f"{len(regressions)} benchmarks are more than {args.threshold:.0%} slower than the baseline")
+            sys.exit(1)
@@ -2,6 +2,8 @@ from blokus.piece_type import PieceType
 from blokus.bitboard import Bitboard
 
 class Action:
+    __slots__ = ("destination", "shape", "piece_type")
+
     def __init__(self, destination, shape):
         self.destination = destination
         self.shape = shape
@@ -23,11 +25,8 @@ class Action:
 
     @staticmethod
     def from_bitboard(board):
-        original_board = board.clone()
         left = top = 21
-        while board.fields != 0:
-            field_index = board.trailing_zeros()
-            board.flip_bit(field_index)
+        for field_index in board.indices():
             x = field_index % 21
             y = (field_index - x) // 21
             if y < top:
@@ -36,13 +35,16 @@ class Action:
                 left = x
         destination = left + top * 21
         for shape in range(91):
-            if Bitboard.with_piece(destination, shape) == original_board:
+            if Bitboard.with_piece(destination, shape) == board:
                 return Action(destination, shape)
         print("Can't determine action from Bitboard")
-        print(original_board)
+        print(board)
 
     def __eq__(self, other):
         return other != None and self.shape == other.shape and self.destination == other.destination
 
+    def __hash__(self):
+        return self.destination << 7 | self.shape
+
     def __repr__(self):
         return f"Set {repr(self.piece_type)} to {self.destination} (X={self.destination % 21} Y={(self.destination - (self.destination % 21)) // 21} Shape={self.shape})"
@@ -1,5 +1,7 @@
 
 class Bitboard:
+    __slots__ = ("fields",)
+
     def __init__(self, fields=0):
         self.fields = fields
 
@@ -10,49 +12,39 @@ class Bitboard:
         return self.fields & (1 << bit_index) != 0
 
     def count_ones(self) -> int:
-        ones = 0
-        bit = 1
-        board_copy = self.fields
-        while board_copy != 0:
-            if bit & board_copy != 0:
-                ones += 1
-                board_copy ^= bit
-            bit <<= 1
-        return ones
+        return self.fields.bit_count()
 
     def trailing_zeros(self) -> int:
-        bit = 1
-        for i in range(512):
-            if bit & self.fields == bit:
-                return i
-            bit <<= 1
-        return 512
+        if self.fields == 0:
+            return 512
+        return (self.fields & -self.fields).bit_length() - 1
+
+    def indices(self) -> list:
+        indices = []
+        fields = self.fields
+        while fields != 0:
+            bit = fields & -fields
+            indices.append(bit.bit_length() - 1)
+            fields ^= bit
+        return indices
 
     def flip(self):
-        board = Bitboard()
-        for row in range(20):
-            board |= (self >> (21 * row) & ROW_MASK) << ((19 - row) * 21)
-        return board
+        return Bitboard(flip_fields(self.fields & VALID_FIELDS_MASK))
 
     def mirror(self):
-        board = Bitboard()
-        for col in range(20):
-            board |= ((self >> col) & COLUMN_MASK) << (19 - col)
-        return board
+        return Bitboard(mirror_fields(self.fields & VALID_FIELDS_MASK))
 
     def mirror_diagonal(self):
-        board = Bitboard()
-        for x in range(20):
-            for y in range(20):
-                if self.check_bit(x + y * 21):
-                    board.flip_bit(y + x * 21)
-        return board
+        return Bitboard(transpose_fields(self.fields & VALID_FIELDS_MASK))
 
     def rotate_left(self):
-        return self.mirror_diagonal().flip()
+        return self.transform(6)
 
     def rotate_right(self):
-        return self.mirror_diagonal().mirror()
+        return self.transform(5)
+
+    def transform(self, symmetry: int):
+        return Bitboard(transform_fields(self.fields, symmetry))
 
     def get_start_corner(self) -> int:
         if self.check_bit(0):
@@ -76,20 +68,20 @@ class Bitboard:
         return Bitboard(self.fields)
 
     def neighbours(self):
-        return (self << 1 | self >> 1 | self >> 21 | self << 21) & VALID_FIELDS
+        return Bitboard(neighbour_fields(self.fields))
 
     def diagonal_neighbours(self):
-        return (self << 22 | self >> 22 | self >> 20 | self << 20) & VALID_FIELDS
+        return Bitboard(diagonal_neighbour_fields(self.fields))
 
     def __iter__(self):
         return self
 
     def __next__(self) -> int:
-        bit_index = self.trailing_zeros()
-        if bit_index == 512:
+        if self.fields == 0:
             raise StopIteration
-        self.flip_bit(bit_index)
-        return bit_index
+        bit = self.fields & -self.fields
+        self.fields ^= bit
+        return bit.bit_length() - 1
 
     def __invert__(self):
         return Bitboard(self.fields ^ 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF)
@@ -109,6 +101,18 @@ class Bitboard:
     def __xor__(self, other):
         return Bitboard(self.fields ^ other.fields)
 
+    def __iand__(self, other):
+        self.fields &= other.fields
+        return self
+
+    def __ior__(self, other):
+        self.fields |= other.fields
+        return self
+
+    def __ixor__(self, other):
+        self.fields ^= other.fields
+        return self
+
     def __eq__(self, other):
         return self.fields == other.fields
 
@@ -148,6 +152,12 @@ class Bitboard:
             actions.append(Action.from_bitboard(piece))
         return actions
 
+def neighbour_fields(fields: int) -> int:
+    return (fields << 1 | fields >> 1 | fields >> 21 | fields << 21) & VALID_FIELDS_MASK
+
+def diagonal_neighbour_fields(fields: int) -> int:
+    return (fields << 22 | fields >> 22 | fields >> 20 | fields << 20) & VALID_FIELDS_MASK
+
 def convert(*args):
     if len(args) == 2:
         x, y = args
@@ -158,6 +168,7 @@ def convert(*args):
     return x, y
 
 VALID_FIELDS = Bitboard(1353841978519651780606181823587055014201997103708438138826768745134664492555299896889475908923884339705591950360690671800549375)
+VALID_FIELDS_MASK = VALID_FIELDS.fields
 START_FIELDS = Bitboard(1 << 418 | 1 << 399 | 1 | 1 << 19)
 ROW_MASK = Bitboard(1048575)
 COLUMN_MASK = Bitboard.from_parts(
@@ -259,3 +270,87 @@ PIECE_SHAPES = [
     31457284,
     31457282
 ]
+
+def _delta_swap(fields: int, mask: int, delta: int) -> int:
+    t = ((fields >> delta) ^ fields) & mask
+    return fields ^ t ^ (t << delta)
+
+def _repeat(columns, rows) -> int:
+    return sum(1 << (x + y * 21) for x in columns for y in rows)
+
+# Reversing 20 = 2 * 2 * 5 positions: swap halves, swap quarters, then reverse the groups of five
+MIRROR_SWAPS = [
+    (_repeat(range(10), range(20)), 10),
+    (_repeat([0, 1, 2, 3, 4, 10, 11, 12, 13, 14], range(20)), 5),
+    (_repeat([0, 5, 10, 15], range(20)), 4),
+    (_repeat([1, 6, 11, 16], range(20)), 2),
+]
+FLIP_SWAPS = [
+    (_repeat(range(20), range(10)), 210),
+    (_repeat(range(20), [0, 1, 2, 3, 4, 10, 11, 12, 13, 14]), 105),
+    (_repeat(range(20), [0, 5, 10, 15]), 84),
+    (_repeat(range(20), [1, 6, 11, 16]), 42),
+]
+# TRANSPOSE_TABLES[half][row] is the transposed column for the lower and upper ten bits of a row
+TRANSPOSE_TABLES = [
+    [sum(1 << ((x + half * 10) * 21) for x in range(10) if row >> x & 1) for row in range(1024)]
+    for half in range(2)
+]
+
+def mirror_fields(fields: int) -> int:
+    for mask, delta in MIRROR_SWAPS:
+        fields = _delta_swap(fields, mask, delta)
+    return fields
+
+def flip_fields(fields: int) -> int:
+    for mask, delta in FLIP_SWAPS:
+        fields = _delta_swap(fields, mask, delta)
+    return fields
+
+def transpose_fields(fields: int) -> int:
+    lower, upper = TRANSPOSE_TABLES
+    transposed = 0
+    for y in range(20):
+        row = fields >> (y * 21)
+        transposed |= (lower[row & 1023] | upper[row >> 10 & 1023]) << y
+    return transposed
+
+# Symmetries are numbered by the bits transpose (4), flip (2) and mirror (1), applied in that order:
+# 0 identity, 1 mirror, 2 flip, 3 rotate by 180 degrees, 4 mirror_diagonal,
+# 5 rotate_right, 6 rotate_left, 7 mirror on the anti-diagonal
+def transform_fields(fields: int, symmetry: int) -> int:
+    fields &= VALID_FIELDS_MASK
+    if symmetry & 4:
+        fields = transpose_fields(fields)
+    if symmetry & 2:
+        fields = flip_fields(fields)
+    if symmetry & 1:
+        fields = mirror_fields(fields)
+    return fields
+
+_batch_swaps = {}
+
+def _get_batch_swaps(boards: int) -> tuple:
+    if boards not in _batch_swaps:
+        _batch_swaps[boards] = tuple(
+            [(sum(mask << (420 * board) for board in range(boards)), delta) for mask, delta in swaps]
+            for swaps in (MIRROR_SWAPS, FLIP_SWAPS)
+        )
+    return _batch_swaps[boards]
+
+# Flips and mirrors several boards at once by stacking them into one integer, 420 bits per board
+def transform_boards(boards, symmetry: int) -> list:
+    fields = 0
+    for index, board in enumerate(boards):
+        board_fields = board.fields & VALID_FIELDS_MASK
+        if symmetry & 4:
+            board_fields = transpose_fields(board_fields)
+        fields |= board_fields << (420 * index)
+    mirror_swaps, flip_swaps = _get_batch_swaps(len(boards))
+    if symmetry & 2:
+        for mask, delta in flip_swaps:
+            fields = _delta_swap(fields, mask, delta)
+    if symmetry & 1:
+        for mask, delta in mirror_swaps:
+            fields = _delta_swap(fields, mask, delta)
+    return [Bitboard(fields >> (420 * index) & VALID_FIELDS_MASK) for index in range(len(boards))]
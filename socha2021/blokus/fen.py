@@ -0,0 +1,51 @@
+from itertools import chain
+
+# FEN: "<data> <pieces> <board 0> <board 1> <board 2> <board 3>", every board as four decimal 128 bit parts
+# from the most to the least significant. The hex variant is a single token of fixed width hex numbers:
+# 107 digits data, 21 digits pieces and 105 digits per board. data holds 17 bits and the skipped history,
+# which grows by 4 bits per skip and a game ends after at most 101 plies.
+PART_MASK = (1 << 128) - 1
+HEX_FEN_LENGTH = 107 + 21 + 4 * 105
+_PLACED_DIGITS = bytes.maketrans(b"\x00\x01", b"10")
+# _BYTE_LEFT[byte] has the pieces_left flags of the 8 bits in byte
+_BYTE_LEFT = [tuple(byte >> bit & 1 == 0 for bit in range(8)) for byte in range(256)]
+
+# pieces has the bit piece_type + 21 * color set for every placed piece
+def unpack_pieces_left(pieces: int) -> list:
+    left = list(chain.from_iterable(map(_BYTE_LEFT.__getitem__, pieces.to_bytes(11, "little"))))
+    return [left[piece_type:84:21] for piece_type in range(21)]
+
+def pack_pieces_left(pieces_left: list) -> int:
+    left = bytes([row[color] for color in range(4) for row in pieces_left])
+    return int(left.translate(_PLACED_DIGITS)[::-1], 2)
+
+# Number of leading entries of a split line that belong to the FEN, 1 for a hex FEN and 18 otherwise
+def fen_tokens(entries: list) -> int:
+    return 1 if len(entries) != 0 and len(entries[0]) == HEX_FEN_LENGTH else 18
+
+def parse_fen(fen: str) -> tuple:
+    entries = fen.split(maxsplit=18)
+    if len(entries[0]) == HEX_FEN_LENGTH:
+        return parse_hex_fen(entries[0])
+    values = [int(entry) for entry in entries[:18]]
+    assert len(values) == 18
+    boards = [values[i] << 384 | values[i + 1] << 256 | values[i + 2] << 128 | values[i + 3] for i in range(2, 18, 4)]
+    return values[0], values[1], boards
+
+def format_board(board: int) -> str:
+    return f"{board >> 384} {board >> 256 & PART_MASK} {board >> 128 & PART_MASK} {board & PART_MASK}"
+
+def format_fen(data: int, pieces: int, boards: list) -> str:
+    return f"{data} {pieces} " + " ".join(format_board(board) for board in boards)
+
+def parse_hex_fen(fen: str) -> tuple:
+    fen = fen.strip()
+    if len(fen) != HEX_FEN_LENGTH:
+        raise ValueError(f"a hex FEN has {HEX_FEN_LENGTH} digits, not {len(fen)}")
+    boards = [int(fen[start:start + 105], 16) for start in range(128, HEX_FEN_LENGTH, 105)]
+    return int(fen[:107], 16), int(fen[107:128], 16), boards
+
+def format_hex_fen(data: int, pieces: int, boards: list) -> str:
+    if data >> 428 != 0:
+        raise ValueError("the skipped history does not fit into a hex FEN")
+    return f"{data:0107x}{pieces:021x}" + "".join(f"{board:0105x}" for board in boards)
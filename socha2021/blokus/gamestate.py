@@ -1,10 +1,18 @@
 import random
+from array import array
 from blokus.bitboard import *
 from blokus.action import Action
 from blokus.color import Color
 from blokus.piece_type import *
+from blokus.placement_table import PLACEMENT_TABLE
+from blokus.zobrist import *
+from blokus.fen import *
+from blokus.move_cache import MoveCache
 
 class GameState:
+    # Optional MoveCache shared by all states, keyed by the Zobrist hash
+    move_cache = None
+
     def __init__(self, fen=None):
         self.ply = 0
         self.skipped = 0
@@ -13,66 +21,109 @@ class GameState:
         self.pieces_left = [[True] * 4 for _ in range(21)]
         self.monomino_placed_last = [False] * 4
         self.current_color = Color.BLUE
+        self.legal_fields = [VALID_FIELDS_MASK] * 4
+        self.placement_fields = [0] * 4
+        self.field_history = []
         if fen != None:
             self.load_fen(fen)
+        else:
+            self.hash = hash_state(self)
 
     def do_action(self, action):
         if action == None:
+            self.hash ^= SKIPPED_KEYS[self.skipped & 0b1111]
             self.skipped = ((self.skipped & 0b1111) | self.skipped << 4) | (1 << self.current_color.value)
+            self.hash ^= SKIPPED_KEYS[self.skipped & 0b1111]
         else:
-            self.pieces_left[action.piece_type.value][self.current_color.value] = False
-            self.board[self.current_color.value] ^= Bitboard.with_piece(action.destination, action.shape)
-            self.monomino_placed_last[self.current_color.value] = action.piece_type == PieceType.Monomino
+            color = self.current_color.value
+            piece = PIECE_SHAPES[action.shape] << action.destination
+            self.pieces_left[action.piece_type.value][color] = False
+            self.board[color].fields ^= piece
+            self.monomino_placed_last[color] = action.piece_type == PieceType.Monomino
+            self.field_history.append((self.legal_fields, self.placement_fields))
+            self.legal_fields = [fields & ~piece for fields in self.legal_fields]
+            self.placement_fields = [fields & ~piece for fields in self.placement_fields]
+            self.legal_fields[color] &= ~neighbour_fields(piece)
+            self.placement_fields[color] = (self.placement_fields[color] | diagonal_neighbour_fields(piece)) & self.legal_fields[color]
+            self.hash ^= piece_key(color, action.destination, action.shape) ^ PIECE_KEYS[action.piece_type.value][color]
+        self.hash ^= COLOR_KEYS[self.current_color.value]
         self.current_color = self.current_color.next()
+        self.hash ^= COLOR_KEYS[self.current_color.value]
         self.ply += 1
 
     def undo_action(self, action):
         self.ply -= 1
+        self.hash ^= COLOR_KEYS[self.current_color.value]
         self.current_color = self.current_color.previous()
+        self.hash ^= COLOR_KEYS[self.current_color.value]
         if action == None:
+            self.hash ^= SKIPPED_KEYS[self.skipped & 0b1111]
             self.skipped >>= 4
+            self.hash ^= SKIPPED_KEYS[self.skipped & 0b1111]
         else:
-            piece = Bitboard.with_piece(action.destination, action.shape)
             self.pieces_left[action.piece_type.value][self.current_color.value] = True
-            self.board[self.current_color.value] ^= piece
+            self.board[self.current_color.value].fields ^= PIECE_SHAPES[action.shape] << action.destination
+            self.legal_fields, self.placement_fields = self.field_history.pop()
+            self.hash ^= piece_key(self.current_color.value, action.destination, action.shape) ^ PIECE_KEYS[action.piece_type.value][self.current_color.value]
+
+    def recalculate(self):
+        occupied = self.get_occupied_fields().fields
+        for color in range(4):
+            own_fields = self.board[color].fields
+            self.legal_fields[color] = ~(occupied | neighbour_fields(own_fields)) & VALID_FIELDS_MASK
+            self.placement_fields[color] = diagonal_neighbour_fields(own_fields) & self.legal_fields[color]
+        self.field_history = []
+        self.hash = hash_state(self)
+
+    def get_legal_fields(self, color):
+        return Bitboard(self.legal_fields[color])
+
+    def get_placement_fields(self, color):
+        if self.ply > 3:
+            return Bitboard(self.placement_fields[color])
+        return START_FIELDS & ~(self.get_occupied_fields() & ~self.board[color])
 
     def get_occupied_fields(self):
-        return self.board[0] | self.board[1] | self.board[2] | self.board[3]
+        return Bitboard(self.board[0].fields | self.board[1].fields | self.board[2].fields | self.board[3].fields)
 
     def get_possible_actions(self):
-        possible_actions = []
-        own_fields = self.board[self.current_color.value]
-        other_fields = self.get_occupied_fields() & ~own_fields
-        legal_fields = ~(own_fields | other_fields | own_fields.neighbours()) & VALID_FIELDS
-        if self.ply > 3:
-            placement_fields = own_fields.diagonal_neighbours() & legal_fields
-        else:
-            placement_fields = START_FIELDS & ~other_fields
+        return [Action.deserialize(move) for move in self.get_possible_moves()]
 
-        for piece_type in PIECE_TABLE:
-            if not self.pieces_left[piece_type[0].value][self.current_color.value]:
+    def get_possible_moves(self):
+        if GameState.move_cache is None:
+            return self.generate_moves()
+        key = (self.hash, self.ply < 4)
+        moves = GameState.move_cache.get(key)
+        if moves is None:
+            moves = self.generate_moves()
+            GameState.move_cache.put(key, moves)
+        return moves[:]
+
+    def generate_moves(self):
+        # Moves are packed like Action.serialize: destination << 7 | shape, 0xFFFF to skip
+        moves = array("H")
+        color = self.current_color.value
+        legal_fields = self.legal_fields[color]
+        candidate_fields = self.get_placement_fields(color).indices()
+
+        for piece_type, placements in PLACEMENT_TABLE:
+            if not self.pieces_left[piece_type.value][color]:
                 continue
-            candidates = placement_fields.clone()
-            for candidate_field in candidates:
-                shape = piece_type[2]
-                for offsets in piece_type[1]:
-                    for offset in offsets:
-                        if candidate_field >= offset:
-                            destination = candidate_field - offset
-                            piece = Bitboard.with_piece(destination, shape)
-                            if piece & legal_fields == piece:
-                                possible_actions.append(Action(destination, shape))
-                    shape += 1
-
-        if self.pieces_left[PieceType.Monomino.value][self.current_color.value]:
-            for destination in placement_fields:
-                possible_actions.append(Action(destination, 0))
+            if self.ply < 4 and piece_type != self.start_piece_type:
+                continue
+            for candidate_field in candidate_fields:
+                for move, piece in placements[candidate_field]:
+                    if piece & legal_fields == piece:
+                        moves.append(move)
 
         if self.ply < 4:
-            return [action for action in possible_actions if action.piece_type == self.start_piece_type]
-        if len(possible_actions) != 0:
-            return possible_actions
-        return [None]
+            return moves
+        if self.pieces_left[PieceType.Monomino.value][color]:
+            for destination in candidate_fields:
+                moves.append(destination << 7)
+        if len(moves) == 0:
+            moves.append(0xFFFF)
+        return moves
 
     def is_game_over(self):
         return self.skipped & 0b1111 == 0b1111 or self.ply > 100
@@ -87,38 +138,36 @@ class GameState:
         return scores[0] + scores[2] - scores[1] - scores[3]
 
     def load_fen(self, fen):
-        entries = [int(entry) for entry in fen.split(" ")[:18]]
-        assert len(entries) == 18
-        data = entries[0]
+        # Also reads the hex variant written by to_hex_fen
+        data, pieces, boards = parse_fen(fen)
+        self.load_position(data, pieces, boards)
+
+    def load_position(self, data, pieces, boards):
         for i in range(4):
             self.monomino_placed_last[i] = data & 1 << i != 0
         self.start_piece_type = PieceType(data >> 4 & 0b11111)
         self.ply = data >> 9 & 0b11111111
         self.current_color = Color.from_ply(self.ply)
         self.skipped = data >> 17
-        pieces = entries[1]
+        self.pieces_left = unpack_pieces_left(pieces)
         for color in range(4):
-            for piece_type in range(21):
-                if pieces & 1 << (piece_type + color * 21) != 0:
-                    self.pieces_left[piece_type][color] = False
-            self.board[color].fields = entries[color * 4 + 2] << 384
-            self.board[color].fields |= entries[color * 4 + 3] << 256
-            self.board[color].fields |= entries[color * 4 + 4] << 128
-            self.board[color].fields |= entries[color * 4 + 5]
-        return entries
+            self.board[color].fields = boards[color]
+        self.recalculate()
 
-    def to_fen(self):
+    def get_position(self):
         data = self.start_piece_type.value << 4
         data |= self.ply << 9
         data |= self.skipped << 17
-        pieces = 0
         for color in range(4):
             if self.monomino_placed_last[color]:
                 data |= 1 << color
-            for piece_type in range(21):
-                if not self.pieces_left[piece_type][color]:
-                    pieces |= 1 << (piece_type + color * 21)
-        return f"{data} {pieces} {self.board[0].to_fen()} {self.board[1].to_fen()} {self.board[2].to_fen()} {self.board[3].to_fen()}"
+        return data, pack_pieces_left(self.pieces_left), [self.board[color].fields for color in range(4)]
+
+    def to_fen(self):
+        return format_fen(*self.get_position())
+
+    def to_hex_fen(self):
+        return format_hex_fen(*self.get_position())
 
     @staticmethod
     def random(n=8):
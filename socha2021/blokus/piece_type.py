@@ -43,29 +43,37 @@ class PieceType(Enum):
 
     @staticmethod
     def from_shape(shape):
-        if shape == 0: return PieceType.Monomino
-        if shape < 3: return PieceType.Domino
-        if shape < 5: return PieceType.ITromino
-        if shape < 7: return PieceType.ITetromino
-        if shape < 9: return PieceType.IPentomino
-        if shape == 9: return PieceType.OTetromino
-        if shape == 10: return PieceType.XPentomino
-        if shape < 15: return PieceType.LTromino
-        if shape < 23: return PieceType.LTetromino
-        if shape < 31: return PieceType.LPentomino
-        if shape < 35: return PieceType.TPentomino
-        if shape < 39: return PieceType.TTetromino
-        if shape < 43: return PieceType.ZTetromino
-        if shape < 47: return PieceType.ZPentomino
-        if shape < 51: return PieceType.UPentomino
-        if shape < 59: return PieceType.FPentomino
-        if shape < 63: return PieceType.WPentomino
-        if shape < 71: return PieceType.NPentomino
-        if shape < 75: return PieceType.VPentomino
-        if shape < 83: return PieceType.PPentomino
-        if shape < 92: return PieceType.YPentomino
+        if 0 <= shape < len(SHAPE_TO_PIECE_TYPE):
+            return SHAPE_TO_PIECE_TYPE[shape]
         raise ValueError(f"Invalid shape: {shape}")
 
+SHAPE_TO_PIECE_TYPE = []
+for piece_type, shapes in [
+    (PieceType.Monomino, 1),
+    (PieceType.Domino, 2),
+    (PieceType.ITromino, 2),
+    (PieceType.ITetromino, 2),
+    (PieceType.IPentomino, 2),
+    (PieceType.OTetromino, 1),
+    (PieceType.XPentomino, 1),
+    (PieceType.LTromino, 4),
+    (PieceType.LTetromino, 8),
+    (PieceType.LPentomino, 8),
+    (PieceType.TPentomino, 4),
+    (PieceType.TTetromino, 4),
+    (PieceType.ZTetromino, 4),
+    (PieceType.ZPentomino, 4),
+    (PieceType.UPentomino, 4),
+    (PieceType.FPentomino, 8),
+    (PieceType.WPentomino, 4),
+    (PieceType.NPentomino, 8),
+    (PieceType.VPentomino, 4),
+    (PieceType.PPentomino, 8),
+    (PieceType.YPentomino, 8),
+]:
+    SHAPE_TO_PIECE_TYPE += [piece_type] * shapes
+del piece_type, shapes
+
 PIECE_TABLE = [
     [PieceType.FPentomino, [[1, 23, 42, 43], [1, 21, 43, 44], [1, 2, 21, 43], [0, 1, 23, 43], [2, 21, 23, 43], [0, 21, 23, 43], [1, 21, 23, 44], [1, 21, 23, 42]], 51],
     [PieceType.YPentomino, [[0, 22, 42, 63], [0, 21, 43, 63], [1, 22, 42, 64], [1, 21, 43, 64], [0, 1, 3, 23], [0, 2, 3, 22], [2, 21, 22, 24], [1, 21, 23, 24]], 83],
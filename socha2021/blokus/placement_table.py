@@ -0,0 +1,31 @@
+from blokus.bitboard import PIECE_SHAPES, VALID_FIELDS
+from blokus.piece_type import PIECE_TABLE
+
+def _build_placement_table():
+    valid_fields = VALID_FIELDS.fields
+    masks = {}
+    table = []
+    for piece_type, shapes, first_shape in PIECE_TABLE:
+        placements = []
+        for field in range(420):
+            entries = []
+            shape = first_shape
+            for offsets in shapes:
+                for offset in offsets:
+                    destination = field - offset
+                    if destination < 0:
+                        continue
+                    key = (destination, shape)
+                    if key not in masks:
+                        masks[key] = PIECE_SHAPES[shape] << destination
+                    piece = masks[key]
+                    if piece & valid_fields == piece:
+                        entries.append((destination << 7 | shape, piece))
+                shape += 1
+            placements.append(tuple(entries))
+        table.append((piece_type, placements))
+    return table
+
+# For every entry of PIECE_TABLE and every field: all placements of that piece which touch the
+# field with one of their corners and fit on the board, as (destination << 7 | shape, mask) pairs.
+PLACEMENT_TABLE = _build_placement_table()
@@ -0,0 +1,130 @@
+import os
+import sys
+import json
+import time
+import atexit
+
+# Opt-in call counters and timers for the hot paths. Nothing is wrapped until enable() is called, so a
+# disabled profiler costs nothing. enable() has to run after the profiled modules were imported.
+# Times are inclusive, a phase that calls another phase contains its time.
+PROFILED = [
+    ("blokus.gamestate", "GameState.generate_moves", "move generation"),
+    ("blokus.gamestate", "GameState.get_possible_moves", "get_possible_moves"),
+    ("blokus.gamestate", "GameState.do_action", "do_action"),
+    ("blokus.gamestate", "GameState.undo_action", "undo_action"),
+    ("blokus.gamestate", "GameState.load_fen", "load_fen"),
+    ("blokus.gamestate", "GameState.to_fen", "to_fen"),
+    ("encoding", "states_to_input", "states_to_input"),
+    ("encoding", "state_to_input", "state_to_input"),
+    ("encoding", "score_moves", "score_moves"),
+    ("encoding", "to_example", "to_example"),
+    ("neural_network", "pick_best_move", "pick_best_move"),
+    ("tensorflow", "keras.Model.predict_on_batch", "model.predict_on_batch"),
+    ("tensorflow", "keras.Model.predict", "model.predict"),
+    ("tensorflow", "keras.Model.fit", "model.fit"),
+]
+
+class Profiler:
+    def __init__(self):
+        self.calls = {}
+        self.seconds = {}
+        self.patches = []
+        self.start_time = None
+
+    def wrap(self, label: str, function):
+        calls = self.calls
+        seconds = self.seconds
+        calls.setdefault(label, 0)
+        seconds.setdefault(label, 0.0)
+
+        def profiled(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                seconds[label] += time.perf_counter() - start
+                calls[label] += 1
+
+        profiled.__wrapped__ = function
+        return profiled
+
+    def patch(self, owner, name: str, value):
+        self.patches.append((owner, name, owner.__dict__.get(name)))
+        setattr(owner, name, value)
+
+    def enable(self, profiled=PROFILED):
+        if self.enabled():
+            return
+        self.start_time = time.perf_counter()
+        for module_name, path, label in profiled:
+            if module_name not in sys.modules:
+                continue
+            owner = sys.modules[module_name]
+            *owner_path, name = path.split(".")
+            try:
+                for attribute in owner_path:
+                    owner = getattr(owner, attribute)
+                function = getattr(owner, name)
+            except AttributeError:
+                continue
+            wrapper = self.wrap(label, function)
+            if isinstance(owner, type):
+                self.patch(owner, name, wrapper)
+                continue
+            # Functions are also replaced in every module that imported them with "from ... import"
+            for module in list(sys.modules.values()):
+                if getattr(module, name, None) is function:
+                    self.patch(module, name, wrapper)
+
+    def disable(self):
+        for owner, name, value in reversed(self.patches):
+            if value is None:
+                delattr(owner, name)
+            else:
+                setattr(owner, name, value)
+        self.patches = []
+
+    def enabled(self) -> bool:
+        return len(self.patches) != 0
+
+    def reset(self):
+        for label in self.calls:
+            self.calls[label] = 0
+            self.seconds[label] = 0.0
+        self.start_time = time.perf_counter()
+
+    def results(self) -> dict:
+        return {
+            "wall_seconds": 0.0 if self.start_time is None else time.perf_counter() - self.start_time,
+            "phases": {
+                label: {"calls": self.calls[label], "seconds": self.seconds[label]}
+                for label in sorted(self.calls, key=lambda label: -self.seconds[label])
+                if self.calls[label] != 0
+            },
+        }
+
+    def table(self) -> str:
+        results = self.results()
+        wall_seconds = max(results["wall_seconds"], 1e-9)
+        string = f"{'phase':<24} {'calls':>10} {'total s':>10} {'mean us':>10} {'% wall':>7}"
+        for label, phase in results["phases"].items():
+            mean = phase["seconds"] / phase["calls"] * 1e6
+            string += f"\n{label:<24} {phase['calls']:>10} {phase['seconds']:>10.3f} {mean:>10.1f} {phase['seconds'] / wall_seconds:>7.1%}"
+        return string + f"\nwall time {wall_seconds:.3f}s"
+
+    def dump(self, path=None):
+        if path is None:
+            print(self.table())
+            return
+        with open(path, "w") as file:
+            json.dump(self.results(), file, indent=4)
+
+PROFILER = Profiler()
+
+# PROFILE=1 prints a table when the process exits, PROFILE=<file>.json writes the results to the file
+def enable_from_environment(variable="PROFILE"):
+    value = os.environ.get(variable)
+    if not value or value == "0":
+        return
+    PROFILER.enable()
+    atexit.register(PROFILER.dump, value if value.endswith(".json") else None)
@@ -0,0 +1,46 @@
+from collections import namedtuple
+
+TranspositionEntry = namedtuple("TranspositionEntry", ["hash", "depth", "value", "action", "generation"])
+
+class TranspositionTable:
+    def __init__(self, size=1 << 16):
+        assert size > 0 and size & (size - 1) == 0, "size has to be a power of two"
+        self.entries = [None] * size
+        self.mask = size - 1
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, hash):
+        entry = self.entries[hash & self.mask]
+        if entry is not None and entry.hash == hash:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, hash, depth, value, action=None):
+        index = hash & self.mask
+        entry = self.entries[index]
+        # Keep deeper results of the current search, replace everything else
+        if entry is None or entry.hash == hash or entry.generation != self.generation or depth >= entry.depth:
+            self.entries[index] = TranspositionEntry(hash, depth, value, action, self.generation)
+
+    def new_search(self):
+        self.generation += 1
+
+    def clear(self):
+        self.entries = [None] * len(self.entries)
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups != 0 else 0.0
+
+    def __len__(self):
+        return sum(1 for entry in self.entries if entry is not None)
+
+    def __repr__(self):
+        return f"TranspositionTable(size={len(self.entries)}, hits={self.hits}, misses={self.misses}, hit_rate={self.hit_rate():.3f})"
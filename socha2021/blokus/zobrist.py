@@ -0,0 +1,65 @@
+import random
+from blokus.bitboard import PIECE_SHAPES
+from blokus.fen import pack_pieces_left
+
+_random = random.Random(2021)
+
+def _random_keys(n):
+    return [_random.getrandbits(64) for _ in range(n)]
+
+FIELD_KEYS = [_random_keys(420) for _ in range(4)]
+PIECE_KEYS = [_random_keys(4) for _ in range(21)]
+SKIPPED_KEYS = _random_keys(16)
+COLOR_KEYS = _random_keys(4)
+START_PIECE_KEYS = _random_keys(21)
+
+def _shape_fields(shape):
+    fields = []
+    bit_index = 0
+    while shape >> bit_index != 0:
+        if shape >> bit_index & 1:
+            fields.append(bit_index)
+        bit_index += 1
+    return tuple(fields)
+
+SHAPE_FIELDS = [_shape_fields(shape) for shape in PIECE_SHAPES]
+
+def piece_key(color, destination, shape):
+    keys = FIELD_KEYS[color]
+    key = 0
+    for field in SHAPE_FIELDS[shape]:
+        key ^= keys[destination + field]
+    return key
+
+def _byte_keys(keys, n):
+    # tables[i][byte] is the xor of the keys of the bits set in byte i
+    tables = []
+    for i in range(n):
+        table = [0] * 256
+        for byte in range(1, 256):
+            bit = 8 * i + (byte & -byte).bit_length() - 1
+            table[byte] = table[byte & byte - 1] ^ (keys[bit] if bit < len(keys) else 0)
+        tables.append(table)
+    return tables
+
+FIELD_BYTE_KEYS = [_byte_keys(FIELD_KEYS[color], 53) for color in range(4)]
+PIECE_BYTE_KEYS = _byte_keys([PIECE_KEYS[bit % 21][bit // 21] for bit in range(84)], 11)
+
+def bytes_key(tables, data):
+    key = 0
+    for index, byte in enumerate(data):
+        if byte:
+            key ^= tables[index][byte]
+    return key
+
+def hash_position(color, skipped, start_piece_type, pieces, boards):
+    key = COLOR_KEYS[color] ^ SKIPPED_KEYS[skipped & 0b1111] ^ START_PIECE_KEYS[start_piece_type]
+    key ^= bytes_key(PIECE_BYTE_KEYS, pieces.to_bytes(11, "little"))
+    for color in range(4):
+        key ^= bytes_key(FIELD_BYTE_KEYS[color], boards[color].to_bytes(53, "little"))
+    return key
+
+def hash_state(state):
+    boards = [state.board[color].fields for color in range(4)]
+    pieces = pack_pieces_left(state.pieces_left)
+    return hash_position(state.current_color.value, state.skipped, state.start_piece_type.value, pieces, boards)
@@ -0,0 +1,48 @@
+import os
+import json
+import zlib
+import numpy as np
+
+# Checkpoints are the raw float32 weights of every layer in C order, which is what the client reads.
+# The layer shapes and a CRC32 of the data are stored next to it in "<checkpoint>.json".
+CHECKPOINT_FORMAT = 1
+CHECKPOINT_DTYPE = np.dtype("<f4")
+
+def metadata_path(filename: str) -> str:
+    return filename + ".json"
+
+def write_checkpoint(filename: str, weights: list):
+    data = b"".join(np.ascontiguousarray(layer, dtype=CHECKPOINT_DTYPE).tobytes() for layer in weights)
+    with open(filename, "wb") as checkpoint_file:
+        checkpoint_file.write(data)
+    metadata = {
+        "format": CHECKPOINT_FORMAT,
+        "dtype": CHECKPOINT_DTYPE.str,
+        "shapes": [list(layer.shape) for layer in weights],
+        "size": len(data),
+        "crc32": zlib.crc32(data),
+    }
+    with open(metadata_path(filename), "w") as metadata_file:
+        json.dump(metadata, metadata_file)
+
+def read_checkpoint(filename: str, shapes: list) -> list:
+    shapes = [tuple(shape) for shape in shapes]
+    size = sum(int(np.prod(shape)) for shape in shapes) * CHECKPOINT_DTYPE.itemsize
+    metadata = None
+    if os.path.exists(metadata_path(filename)):
+        with open(metadata_path(filename), "r") as metadata_file:
+            metadata = json.load(metadata_file)
+        if [tuple(shape) for shape in metadata["shapes"]] != shapes:
+            raise ValueError(f"{filename} has layer shapes {metadata['shapes']}, the model expects {[list(shape) for shape in shapes]}")
+    if os.path.getsize(filename) != size:
+        raise ValueError(f"{filename} has {os.path.getsize(filename)} bytes, the model expects {size}")
+    data = np.memmap(filename, dtype=CHECKPOINT_DTYPE, mode="r")
+    if metadata is not None and zlib.crc32(data) != metadata["crc32"]:
+        raise ValueError(f"{filename} does not match its checksum")
+    weights = []
+    index = 0
+    for shape in shapes:
+        n = int(np.prod(shape))
+        weights.append(np.array(data[index:index + n]).reshape(shape))
+        index += n
+    return weights
@@ -1,52 +1,117 @@
-import subprocess
 from blokus.gamestate import *
+from engine_pool import *
+from dataset_writer import DatasetWriter
+from blokus.profiler import enable_from_environment
+import os
 import time
 import random
-from threading import Thread
-
-def get_mcts_action(state, i=500_000):
-    cmd = ["dataset.exe", "--fen", state.to_fen(), "--iterations", str(i)]
-    p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-    while True:
-        line = p.stdout.readline().decode("utf-8")
-        if line[:6] == "result":
-            p.terminate()
-            break
-        else:
-            print(line.strip())
-    return line[7:], Action.deserialize(int(line[7:].split()[0]))
-
-def save_data(state, line, path):
+import asyncio
+import argparse
+
+def save_data(state, line, writer):
     entries = line.split()
     del entries[0]
     entries.pop()
     assert len(entries) % 2 == 0
-    with open(path, "a") as file:
-        string = state.to_fen()
-        for entry in entries:
-            string += " " + str(entry)
-        file.write(string + "\n")
-
-def play_game(path, iterations):
-    state = GameState()
-    while not state.is_game_over() and state.ply < 32:
-        if random.random() > 0.4:
-            line, action = get_mcts_action(state, i=iterations)
-            save_data(state, line, path)
-            state.do_action(action)
-        else:
-            state.do_action(random.choice(state.get_possible_actions()))
-        print(state)
-    print(state.game_result())
-
-def run_thread():
-    while True:
-        play_game("datasets/dataset_0.txt", 300_000)    
+    writer.write(state.to_fen() + "".join(" " + str(entry) for entry in entries))
+
+class SelfPlay:
+    def __init__(self, writer, command=ENGINE_COMMAND, persistent=False, workers=None, games=None, positions=None,
+                 concurrent_games=None, iterations=300_000, max_ply=32, mcts_probability=0.6, timeout=None):
+        self.writer = writer
+        self.workers = workers or os.cpu_count()
+        self.pool = EnginePool(command, self.workers, timeout, persistent=persistent)
+        self.games = games
+        self.positions = positions
+        # Random plies leave engines idle, so a few more games than engines keep them busy.
+        # The pool queues the searches of the extra games on the least loaded engines.
+        self.concurrent_games = concurrent_games or 2 * self.workers
+        self.iterations = iterations
+        self.max_ply = max_ply
+        self.mcts_probability = mcts_probability
+        self.started_games = 0
+        self.finished_games = 0
+        self.saved_positions = 0
+        self.start_time = time.perf_counter()
+
+    def done(self) -> bool:
+        return self.positions is not None and self.saved_positions >= self.positions
+
+    def next_game(self) -> bool:
+        if self.done() or (self.games is not None and self.started_games >= self.games):
+            return False
+        self.started_games += 1
+        return True
+
+    async def search(self, state) -> tuple:
+        line = await asyncio.wrap_future(self.pool.submit(state.to_fen(), self.iterations))
+        return line, Action.deserialize(int(line.split()[0]))
+
+    async def play_game(self):
+        state = GameState()
+        while not state.is_game_over() and state.ply < self.max_ply and not self.done():
+            if random.random() < self.mcts_probability:
+                line, action = await self.search(state)
+                save_data(state, line, self.writer)
+                self.saved_positions += 1
+                state.do_action(action)
+            else:
+                state.do_action(random.choice(state.get_possible_actions()))
+        self.finished_games += 1
+
+    async def run_games(self):
+        while self.next_game():
+            await self.play_game()
+
+    def report(self) -> str:
+        seconds = time.perf_counter() - self.start_time
+        return (
+            f"{self.finished_games} games, {self.saved_positions} positions in {seconds:.0f}s "
+            f"({self.saved_positions / seconds:.2f} positions/s, {self.finished_games / seconds:.3f} games/s)"
+        )
+
+    async def report_progress(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            print(self.report(), flush=True)
+
+    async def run(self, report_interval=10.0):
+        reporter = asyncio.create_task(self.report_progress(report_interval))
+        games = [asyncio.create_task(self.run_games()) for _ in range(self.concurrent_games)]
+        try:
+            await asyncio.gather(*games)
+        finally:
+            for task in games + [reporter]:
+                task.cancel()
+            await asyncio.gather(*games, reporter, return_exceptions=True)
+            self.pool.close()
+            print(self.report(), flush=True)
 
 if __name__ == "__main__":
-    for _ in range(10):
-        t = Thread(target=run_thread)
-        t.daemon = True
-        t.start()
-    while True:
-        time.sleep(1)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, help="stop after this many games")
+    parser.add_argument("--positions", type=int, help="stop after this many saved positions")
+    parser.add_argument("--workers", type=int, help="concurrent searches (default: number of cores)")
+    parser.add_argument("--concurrent-games", type=int)
+    parser.add_argument("--iterations", type=int, default=300_000)
+    parser.add_argument("--max-ply", type=int, default=32)
+    parser.add_argument("--timeout", type=float, help="seconds before a search is restarted")
+    parser.add_argument("--report", type=float, default=10.0, help="seconds between progress reports")
+    parser.add_argument("--output", default="datasets")
+    parser.add_argument(
+        "--engine", choices=ENGINES, default="exe",
+        help="dataset.exe with one process per position, dataset.exe --server, mcts.py or stub_engine.py"
+    )
+    args = parser.parse_args()
+    enable_from_environment()
+    writer = DatasetWriter(args.output, max_bytes=256 << 20)
+    self_play = SelfPlay(
+        writer, *ENGINES[args.engine], args.workers, args.games, args.positions,
+        args.concurrent_games, args.iterations, args.max_ply, timeout=args.timeout
+    )
+    try:
+        asyncio.run(self_play.run(args.report))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
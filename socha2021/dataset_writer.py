@@ -0,0 +1,108 @@
+import os
+import json
+import time
+import queue
+import threading
+
+# A single thread owns the output files. Producers only put finished lines into a queue, so lines from
+# different games never interleave and files are opened once per rotation instead of once per record.
+# Files are called "<prefix>_<n>.txt" and every file gets a "<prefix>_<n>.json" manifest.
+class DatasetWriter:
+    def __init__(self, directory="datasets", prefix="dataset", max_bytes=1 << 30, flush_records=256,
+                 flush_seconds=5.0, fsync=True, max_queued=1 << 16):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.flush_records = flush_records
+        self.flush_seconds = flush_seconds
+        self.fsync = fsync
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.error = None
+        self.index = 0
+        self.open_next()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def path(self, extension: str, index=None) -> str:
+        index = self.index if index is None else index
+        return os.path.join(self.directory, f"{self.prefix}_{index}.{extension}")
+
+    def open_next(self):
+        # Continues the last existing file unless it is full
+        while os.path.exists(self.path("txt")) and (
+            os.path.exists(self.path("txt", self.index + 1))
+            or os.path.getsize(self.path("txt")) >= self.max_bytes
+        ):
+            self.index += 1
+        # Binary mode, so that tell() and the counted lengths are both bytes on every platform
+        self.file = open(self.path("txt"), "ab")
+        self.manifest = {"file": os.path.basename(self.path("txt")), "records": 0, "bytes": 0, "created": time.time()}
+        if os.path.exists(self.path("json")):
+            with open(self.path("json"), "r") as manifest_file:
+                self.manifest.update(json.load(manifest_file))
+        self.manifest["bytes"] = self.file.tell()
+
+    def write(self, line: str):
+        if self.error is not None:
+            raise self.error
+        assert "\n" not in line
+        self.queue.put(line)
+
+    def run(self):
+        try:
+            batch = []
+            deadline = time.monotonic() + self.flush_seconds
+            while True:
+                try:
+                    line = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    line = ""
+                if line is None:
+                    break
+                if line:
+                    batch.append(line)
+                if len(batch) >= self.flush_records or time.monotonic() >= deadline:
+                    self.write_batch(batch)
+                    batch = []
+                    deadline = time.monotonic() + self.flush_seconds
+            self.write_batch(batch)
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.file.close()
+
+    def write_batch(self, batch: list):
+        for line in batch:
+            data = (line + "\n").encode("utf-8")
+            if self.manifest["bytes"] != 0 and self.manifest["bytes"] + len(data) > self.max_bytes:
+                self.flush()
+                self.file.close()
+                self.index += 1
+                self.open_next()
+            self.file.write(data)
+            self.manifest["records"] += 1
+            self.manifest["bytes"] += len(data)
+        if len(batch) != 0:
+            self.flush()
+
+    def flush(self):
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        self.manifest["updated"] = time.time()
+        with open(self.path("json") + ".tmp", "w") as manifest_file:
+            json.dump(self.manifest, manifest_file)
+        os.replace(self.path("json") + ".tmp", self.path("json"))
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
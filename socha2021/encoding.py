@@ -0,0 +1,191 @@
+import numpy as np
+from blokus.gamestate import *
+
+INPUT_SHAPE = (20, 20, 5)
+# FIELD_INDICES[x][y] is the bit index of the field (x, y)
+FIELD_INDICES = np.array([[convert(x, y) for y in range(20)] for x in range(20)])
+
+def reachable_fields(state) -> int:
+    fields = 0
+    for move in state.get_possible_moves():
+        if move != 0xFFFF:
+            fields |= PIECE_SHAPES[move & 0b1111111] << (move >> 7)
+    return fields
+
+def fields_to_planes(fields) -> np.ndarray:
+    data = b"".join(entry.to_bytes(53, "little") for entry in fields)
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8).reshape(-1, 53), axis=1, bitorder="little")
+    return bits[:, FIELD_INDICES]
+
+def state_planes(state) -> list:
+    color = state.current_color.value
+    return [state.board[(color + i) % 4].fields for i in range(4)] + [reachable_fields(state)]
+
+def states_to_input(states, dtype=np.float32) -> np.ndarray:
+    planes = fields_to_planes([fields for state in states for fields in state_planes(state)])
+    return planes.reshape(len(states), 5, 20, 20).transpose(0, 2, 3, 1).astype(dtype)
+
+def state_to_input(state, dtype=np.float32) -> np.ndarray:
+    return states_to_input([state], dtype)[0]
+
+# Parses the FENs at the start of dataset lines without building a GameState. Numbers are split into
+# little endian uint64 words: data (n, 7), pieces (n, 2) and boards (n, 4, 7).
+def fen_lines_to_arrays(lines) -> tuple:
+    data = []
+    pieces = []
+    boards = []
+    for line in lines:
+        position = parse_fen(line)
+        data.append(position[0].to_bytes(56, "little"))
+        pieces.append(position[1].to_bytes(16, "little"))
+        boards.extend(board.to_bytes(56, "little") for board in position[2])
+    return (
+        np.frombuffer(b"".join(data), dtype="<u8").reshape(-1, 7),
+        np.frombuffer(b"".join(pieces), dtype="<u8").reshape(-1, 2),
+        np.frombuffer(b"".join(boards), dtype="<u8").reshape(-1, 4, 7),
+    )
+
+def _build_move_footprints() -> np.ndarray:
+    offsets = np.full((len(PIECE_SHAPES), 5), -1)
+    for shape, fields in enumerate(SHAPE_FIELDS):
+        offsets[shape, :len(fields)] = fields
+    fields = np.arange(420)[:, None, None] + offsets[None]
+    x, y = fields % 21, fields // 21
+    footprints = np.where((offsets[None] >= 0) & (x < 20) & (y < 20), x + y * 20, 400)
+    table = np.full((1 << 16, 5), 400, dtype=np.int16)
+    moves = np.arange(420)[:, None] << 7 | np.arange(len(PIECE_SHAPES))[None]
+    table[moves.ravel()] = footprints.reshape(-1, 5)
+    return table
+
+# MOVE_FOOTPRINTS[move] are the output cells (x + y * 20) covered by a packed move, padded with 400
+MOVE_FOOTPRINTS = _build_move_footprints()
+
+def _transform_coordinates(x, y, symmetry: int) -> tuple:
+    # Same order as transform_fields
+    if symmetry & 4:
+        x, y = y, x
+    if symmetry & 2:
+        y = 19 - y
+    if symmetry & 1:
+        x = 19 - x
+    return x, y
+
+def _build_move_transforms() -> np.ndarray:
+    table = np.tile(np.arange(1 << 16, dtype=np.uint16), (8, 1))
+    shapes = {fields: shape for shape, fields in enumerate(PIECE_SHAPES)}
+    destinations = np.arange(420)
+    for shape, fields in enumerate(SHAPE_FIELDS):
+        dx = np.array([field % 21 for field in fields])
+        dy = np.array([field // 21 for field in fields])
+        fits = (destinations % 21 + dx.max() < 20) & (destinations // 21 + dy.max() < 20)
+        moves = destinations[fits] << 7 | shape
+        for symmetry in range(8):
+            # The new destination is the top left corner of the transformed cells
+            x, y = _transform_coordinates(dx, dy, symmetry)
+            transformed_shape = shapes[sum(1 << int(field) for field in x - x.min() + (y - y.min()) * 21)]
+            x, y = _transform_coordinates(destinations[fits, None] % 21 + dx, destinations[fits, None] // 21 + dy, symmetry)
+            table[symmetry, moves] = (x.min(axis=1) + y.min(axis=1) * 21) << 7 | transformed_shape
+    return table
+
+# MOVE_TRANSFORMS[symmetry][move] is the packed move after Bitboard.transform(symmetry), skips stay skips
+MOVE_TRANSFORMS = _build_move_transforms()
+
+def score_moves(moves, out) -> np.ndarray:
+    moves = np.asarray(moves, dtype=np.uint16)
+    out = np.append(np.asarray(out)[:400], 0)
+    return out[MOVE_FOOTPRINTS[moves]].sum(axis=1)
+
+class Rotation:
+    def __init__(self, top_left_corner: int):
+        self.top_left_corner = top_left_corner
+
+    # The corner index is also the symmetry that moves that corner to the top left
+    def rotate_bitboard(self, bitboard: Bitboard) -> Bitboard:
+        return bitboard.transform(self.top_left_corner)
+
+    def rotate_state(self, state: GameState):
+        state.board = transform_boards(state.board, self.top_left_corner)
+        state.recalculate()
+
+    def rotate_move(self, move: int) -> int:
+        return int(MOVE_TRANSFORMS[self.top_left_corner, move])
+
+    def rotate_action(self, action: Action) -> Action:
+        if action == None:
+            return None
+        return Action.deserialize(self.rotate_move(action.destination << 7 | action.shape))
+
+    def rotate_y(self, y):
+        y = np.array(y[:400]).reshape(20, 20)
+        if self.top_left_corner == 1:
+            y = np.fliplr(y)
+        elif self.top_left_corner == 2:
+            y = np.flipud(y)
+        elif self.top_left_corner == 3:
+            y = np.rot90(y, 2)
+        return y.flatten()
+
+    @staticmethod
+    def from_state(state: GameState):
+        current_color = state.current_color.value
+        top_left_corner = 3
+        for corner, field in enumerate([0, 19, 399]):
+            if state.board[current_color].check_bit(field):
+                top_left_corner = corner
+                break
+        return Rotation(top_left_corner)
+
+def to_example(line):
+    state = GameState(line)
+    if state.ply < 4:
+        return None, None
+    r = Rotation.from_state(state)
+    r.rotate_state(state)
+    entries = line.split()
+    entries = entries[fen_tokens(entries):]
+
+    sum_values = np.zeros(shape=(400), dtype=np.float16)
+    n = np.zeros(shape=(400), dtype=np.float16)
+    for i in range(len(entries) // 2):
+        action = Action.deserialize(int(float(entries[i])))
+        value = float(entries[i + 1])
+        if value > 1: continue
+        board = Bitboard.with_piece(action.destination, action.shape)
+        for bit_index in board:
+            x, y = convert(bit_index)
+            index = x + y * 20
+            sum_values[index] += value
+            n[index] += 1
+    """
+    zeros = n == 0
+    n[zeros] = 1000
+    y = sum_values / n
+    y -= min(0, y.min() - 0.1)
+    y[zeros] = 0
+    max_value = y.max()
+    #if max_value == 0:
+    #    return None, None
+    y /= max_value
+    """
+    empty = n == 0
+    not_empty = n != 0
+    if not any(not_empty):
+        return None, None
+    n[empty] = 1
+    y = sum_values / n
+    y -= y[not_empty].min()
+    max = y.max()
+    if max == 0:
+        return None, None
+    y /= max
+    y[empty] = 0
+    y = r.rotate_y(y)
+
+    if np.isnan(y).any() or y[not_empty].min() == 1:
+        return None, None
+    return state_to_input(state), y
+
+def to_examples(line):
+    x, y = to_example(line)
+    if x is not None:
+        yield x, y
@@ -0,0 +1,273 @@
+import sys
+import time
+import threading
+import subprocess
+from collections import deque
+from concurrent.futures import Future
+
+# Persistent engines are started once and read one "<iterations> <fen>" request per line from stdin.
+# Other engines answer a single position given as "--fen <fen> --iterations <iterations>" and exit.
+# Both may print any number of log lines and answer every request with a "result ..." line, in request order.
+ENGINE_COMMAND = ["dataset.exe"]
+# Needs a dataset.exe with a --server mode
+SERVER_ENGINE_COMMAND = ["dataset.exe", "--server"]
+STUB_ENGINE_COMMAND = [sys.executable, "stub_engine.py", "--server"]
+MCTS_ENGINE_COMMAND = [sys.executable, "mcts.py", "--server"]
+# name: (command, persistent)
+ENGINES = {
+    "exe": (ENGINE_COMMAND, False),
+    "exe-server": (SERVER_ENGINE_COMMAND, True),
+    "mcts": (MCTS_ENGINE_COMMAND, True),
+    "stub": (STUB_ENGINE_COMMAND, True),
+}
+
+class EngineCrashed(RuntimeError):
+    pass
+
+def spawn_arguments(fen: str, iterations: int) -> list:
+    return ["--fen", fen, "--iterations", str(iterations)]
+
+def request_line(fen: str, iterations: int) -> str:
+    return f"{iterations} {fen}\n"
+
+# The payload of a "result" line, None for log lines
+def result_payload(line: str):
+    return line[7:].strip() if line.startswith("result") else None
+
+class Request:
+    def __init__(self, fen: str, iterations: int):
+        self.line = request_line(fen, iterations)
+        self.arguments = spawn_arguments(fen, iterations)
+        self.future = Future()
+        # Running futures cannot be cancelled, so the workers can always set the result
+        self.future.set_running_or_notify_cancel()
+        self.retries = 0
+
+class EngineWorker:
+    def __init__(self, command: list, max_retries: int, log=None):
+        self.command = command
+        self.max_retries = max_retries
+        self.log = log
+        self.lock = threading.Lock()
+        self.pending = deque()
+        self.head_started = None
+        self.closed = False
+        self.restarts = 0
+        self.start()
+
+    def start(self):
+        self.process = subprocess.Popen(
+            self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            universal_newlines=True, bufsize=1
+        )
+        threading.Thread(target=self.read, args=(self.process,), daemon=True).start()
+
+    def send(self, request: Request):
+        with self.lock:
+            if len(self.pending) == 0:
+                self.head_started = time.monotonic()
+            self.pending.append(request)
+            try:
+                self.process.stdin.write(request.line)
+                self.process.stdin.flush()
+            except OSError:
+                # The reader thread notices the dead process and resends the pending requests
+                pass
+
+    def read(self, process):
+        for line in process.stdout:
+            payload = result_payload(line)
+            if payload is None:
+                if self.log is not None:
+                    self.log(line.rstrip())
+                continue
+            with self.lock:
+                if process is not self.process or len(self.pending) == 0:
+                    continue
+                request = self.pending.popleft()
+                self.head_started = time.monotonic()
+            request.future.set_result(payload)
+        self.restart(process)
+
+    def restart(self, process, error=None):
+        with self.lock:
+            if process is not self.process or self.closed:
+                return
+            if process.poll() is None:
+                process.kill()
+            pending = self.pending
+            self.pending = deque()
+            if error is not None and len(pending) != 0:
+                pending.popleft().future.set_exception(error)
+            self.restarts += 1
+            self.start()
+        for request in pending:
+            request.retries += 1
+            if request.retries > self.max_retries:
+                request.future.set_exception(EngineCrashed(f"engine crashed {request.retries} times on this request"))
+            else:
+                self.send(request)
+
+    def check_timeout(self, timeout: float):
+        with self.lock:
+            timed_out = len(self.pending) != 0 and time.monotonic() - self.head_started > timeout
+            process = self.process
+        if timed_out:
+            self.restart(process, TimeoutError(f"no result after {timeout} seconds"))
+
+    def load(self) -> int:
+        return len(self.pending)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            process = self.process
+        try:
+            process.stdin.close()
+            process.wait(5)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
+        for request in self.pending:
+            request.future.set_exception(EngineCrashed("engine pool closed"))
+
+# Starts a new engine process for every request, for engines without a server mode
+class SpawnWorker:
+    def __init__(self, command: list, max_retries: int, log=None):
+        self.command = command
+        self.max_retries = max_retries
+        self.log = log
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.pending = deque()
+        self.process = None
+        self.head_started = None
+        self.error = None
+        self.closed = False
+        self.restarts = 0
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def send(self, request: Request):
+        with self.lock:
+            self.pending.append(request)
+            self.wakeup.notify()
+
+    def run(self):
+        while True:
+            with self.lock:
+                while len(self.pending) == 0 and not self.closed:
+                    self.wakeup.wait()
+                if self.closed:
+                    return
+                request = self.pending[0]
+                self.head_started = time.monotonic()
+                self.process = subprocess.Popen(
+                    self.command + request.arguments, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                    universal_newlines=True
+                )
+                process = self.process
+            payload = None
+            for line in process.stdout:
+                payload = result_payload(line)
+                if payload is not None:
+                    break
+                if self.log is not None:
+                    self.log(line.rstrip())
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+            process.stdout.close()
+            with self.lock:
+                self.process = None
+                error = self.error
+                self.error = None
+                if self.closed:
+                    return
+                if payload is None and error is None:
+                    self.restarts += 1
+                    request.retries += 1
+                    if request.retries <= self.max_retries:
+                        continue
+                    error = EngineCrashed(f"engine crashed {request.retries} times on this request")
+                self.pending.popleft()
+            if payload is not None:
+                request.future.set_result(payload)
+            else:
+                request.future.set_exception(error)
+
+    def check_timeout(self, timeout: float):
+        with self.lock:
+            if self.process is not None and time.monotonic() - self.head_started > timeout:
+                self.error = TimeoutError(f"no result after {timeout} seconds")
+                self.process.kill()
+
+    def load(self) -> int:
+        return len(self.pending)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.wakeup.notify()
+            if self.process is not None:
+                self.process.kill()
+        for request in self.pending:
+            request.future.set_exception(EngineCrashed("engine pool closed"))
+
+# persistent selects EngineWorker, which pipelines the requests to one long running engine, or SpawnWorker
+class EnginePool:
+    def __init__(self, command=ENGINE_COMMAND, workers=4, timeout=None, max_retries=2, log=None, persistent=False):
+        worker = EngineWorker if persistent else SpawnWorker
+        self.workers = [worker(command, max_retries, log) for _ in range(workers)]
+        self.timeout = timeout
+        self.closed = threading.Event()
+        if timeout is not None:
+            threading.Thread(target=self.watch, daemon=True).start()
+
+    def watch(self):
+        while not self.closed.wait(min(0.1, self.timeout)):
+            for worker in self.workers:
+                worker.check_timeout(self.timeout)
+
+    def submit(self, fen: str, iterations: int) -> Future:
+        request = Request(fen, iterations)
+        min(self.workers, key=lambda worker: worker.load()).send(request)
+        return request.future
+
+    def search(self, fen: str, iterations: int) -> str:
+        return self.submit(fen, iterations).result()
+
+    def restarts(self) -> int:
+        return sum(worker.restarts for worker in self.workers)
+
+    def close(self):
+        self.closed.set()
+        for worker in self.workers:
+            worker.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def positions_per_hour(search, fens: list, iterations: int) -> float:
+    start = time.perf_counter()
+    for fen in fens:
+        search(fen, iterations)
+    return len(fens) / (time.perf_counter() - start) * 3600
+
+if __name__ == "__main__":
+    from blokus.gamestate import GameState
+
+    fens = [GameState.random(n % 30).to_fen() for n in range(40)]
+    with EnginePool([sys.executable, "stub_engine.py"], workers=1) as pool:
+        print(f"one process per position: {positions_per_hour(pool.search, fens, 1000):.0f} positions/hour")
+    with EnginePool(STUB_ENGINE_COMMAND, workers=1, persistent=True) as pool:
+        pool.search(fens[0], 1)
+        print(f"persistent engine: {positions_per_hour(pool.search, fens, 1000):.0f} positions/hour")
+    with EnginePool(STUB_ENGINE_COMMAND, workers=4, persistent=True) as pool:
+        for future in [pool.submit(fens[0], 1) for _ in range(4)]:
+            future.result()
+        start = time.perf_counter()
+        for future in [pool.submit(fen, 1000) for fen in fens]:
+            future.result()
+        print(f"4 pipelined engines: {len(fens) / (time.perf_counter() - start) * 3600:.0f} positions/hour")
@@ -0,0 +1,184 @@
+from blokus.gamestate import *
+from mcts import MCTS
+import multiprocessing
+import argparse
+import random
+import math
+import time
+import os
+
+# Plays two players against each other on a process pool. Games come in pairs with the same seed, once
+# with player A as BLUE/RED and once as YELLOW/GREEN. Players are given as specs:
+# "random", "heuristic", "mcts:<iterations>" or the path of a network checkpoint.
+
+class RandomPlayer:
+    def __init__(self, rng):
+        self.rng = rng
+
+    def pick_action(self, state):
+        return Action.deserialize(self.rng.choice(state.get_possible_moves()))
+
+# Places the biggest piece that leaves the most own placement fields
+class HeuristicPlayer:
+    def __init__(self, rng):
+        self.rng = rng
+
+    def pick_action(self, state):
+        color = state.current_color.value
+        best_score = -1
+        best_actions = []
+        for move in state.get_possible_moves():
+            action = Action.deserialize(move)
+            if action is None:
+                return None
+            state.do_action(action)
+            score = PIECE_SHAPES[action.shape].bit_count() * 1000 + state.placement_fields[color].bit_count()
+            state.undo_action(action)
+            if score > best_score:
+                best_score = score
+                best_actions = []
+            if score == best_score:
+                best_actions.append(action)
+        return self.rng.choice(best_actions)
+
+class MCTSPlayer:
+    def __init__(self, rng, iterations):
+        self.mcts = MCTS(seed=rng.random())
+        self.iterations = iterations
+
+    def pick_action(self, state):
+        return Action.deserialize(int(self.mcts.search(state, self.iterations).split()[0]))
+
+class NetworkPlayer:
+    networks = {}
+
+    def __init__(self, path):
+        # TensorFlow is only imported inside the worker processes that need it
+        if path not in NetworkPlayer.networks:
+            from neural_network import NeuralNetwork
+            nn = NeuralNetwork()
+            nn.load_weights(path)
+            NetworkPlayer.networks[path] = nn
+        self.nn = NetworkPlayer.networks[path]
+
+    def pick_action(self, state):
+        return self.nn.pick_action(state)[0]
+
+def create_player(spec: str, rng):
+    if spec == "random":
+        return RandomPlayer(rng)
+    if spec == "heuristic":
+        return HeuristicPlayer(rng)
+    if spec.startswith("mcts:"):
+        return MCTSPlayer(rng, int(spec[5:]))
+    if not os.path.exists(spec):
+        raise ValueError(f"unknown player {spec}")
+    return NetworkPlayer(spec)
+
+def play_game(task: tuple) -> tuple:
+    player_a, player_b, seed, a_starts = task
+    random.seed(seed)
+    state = GameState()
+    players = [create_player(player_a, random.Random(2 * seed)), create_player(player_b, random.Random(2 * seed + 1))]
+    if not a_starts:
+        players.reverse()
+    while not state.is_game_over():
+        state.do_action(players[state.current_color.value & 1].pick_action(state))
+    result = state.game_result() if a_starts else -state.game_result()
+    return seed, a_starts, result
+
+def points(result: int) -> float:
+    return 1.0 if result > 0 else 0.0 if result < 0 else 0.5
+
+def expected_score(elo: float) -> float:
+    return 1 / (1 + 10 ** (-elo / 400))
+
+def elo(score: float) -> float:
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+class Statistics:
+    def __init__(self):
+        self.results = []
+
+    def add(self, result: int):
+        self.results.append(result)
+
+    def games(self) -> int:
+        return len(self.results)
+
+    def mean(self) -> float:
+        return sum(self.results) / len(self.results)
+
+    def stddev(self) -> float:
+        mean = self.mean()
+        return math.sqrt(sum((result - mean) ** 2 for result in self.results) / max(1, len(self.results) - 1))
+
+    def score(self) -> float:
+        return sum(points(result) for result in self.results) / len(self.results)
+
+    def elo(self) -> tuple:
+        # Elo difference with a 95% Wilson interval of the score, which stays wide when all games ended the same way
+        z = 1.96
+        n = len(self.results)
+        score = self.score()
+        center = (score + z * z / (2 * n)) / (1 + z * z / n)
+        error = z * math.sqrt(score * (1 - score) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+        return elo(score), elo(center - error), elo(center + error)
+
+    # Log likelihood ratio of H1: elo = elo1 against H0: elo = elo0, normal approximation of the game scores.
+    # A virtual win and loss keep the variance positive when all games ended the same way.
+    def llr(self, elo0: float, elo1: float) -> float:
+        scores = [points(result) for result in self.results] + [0.0, 1.0]
+        score = sum(scores) / len(scores)
+        variance = sum((s - score) ** 2 for s in scores) / len(scores)
+        s0 = expected_score(elo0)
+        s1 = expected_score(elo1)
+        return len(scores) * (s1 - s0) * (2 * score - s0 - s1) / (2 * variance)
+
+    def __repr__(self):
+        wins = sum(1 for result in self.results if result > 0)
+        draws = sum(1 for result in self.results if result == 0)
+        value, lower, upper = self.elo()
+        return (
+            f"{self.games()} games +{wins} ={draws} -{self.games() - wins - draws} "
+            f"result {self.mean():.2f} ± {self.stddev():.2f} elo {value:.0f} [{lower:.0f}, {upper:.0f}]"
+        )
+
+def sprt_bounds(alpha: float, beta: float) -> tuple:
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+def evaluate(player_a: str, player_b: str, games=200, workers=None, seed=0, sprt=None, report=10) -> Statistics:
+    # sprt is None or (elo0, elo1, alpha, beta)
+    tasks = [(player_a, player_b, seed + i // 2, i % 2 == 0) for i in range(games)]
+    statistics = Statistics()
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers) as pool:
+        for _, _, result in pool.imap_unordered(play_game, tasks):
+            statistics.add(result)
+            if statistics.games() % report == 0 or statistics.games() == games:
+                print(statistics, f"{statistics.games() / (time.perf_counter() - start):.2f} games/s", flush=True)
+            if sprt is not None:
+                lower, upper = sprt_bounds(*sprt[2:])
+                llr = statistics.llr(*sprt[:2])
+                if llr <= lower or llr >= upper:
+                    print(f"SPRT: llr {llr:.2f} {'accepts H1' if llr >= upper else 'accepts H0'}")
+                    pool.terminate()
+                    break
+    return statistics
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("player_a", help="random, heuristic, mcts:<iterations> or a checkpoint path")
+    parser.add_argument("player_b", nargs="?", default="random")
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--report", type=int, default=10, help="print the statistics every n games")
+    parser.add_argument("--sprt", type=float, nargs=2, metavar=("ELO0", "ELO1"), help="stop once A is shown to be elo0 or elo1 stronger")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    args = parser.parse_args()
+    sprt = None if args.sprt is None else (args.sprt[0], args.sprt[1], args.alpha, args.beta)
+    statistics = evaluate(args.player_a, args.player_b, args.games, args.workers, args.seed, sprt, args.report)
+    print(statistics)
@@ -0,0 +1,161 @@
+from blokus.gamestate import *
+from encoding import Rotation, MOVE_TRANSFORMS, state_to_input, score_moves
+from copy import deepcopy
+import argparse
+import random
+import math
+import time
+import sys
+
+# Monte Carlo tree search on GameState.do_action/undo_action. Values are win probabilities in [0, 1]
+# from the point of view of the color to move, BLUE and RED play against YELLOW and GREEN.
+# search() returns the payload of the "result" line dataset.exe prints:
+# "<best move> <move> <value> ... <root value>" with packed moves.
+
+class Node:
+    __slots__ = ("color", "moves", "priors", "children", "visits", "values")
+
+    def __init__(self, state, priors=None):
+        self.color = state.current_color.value
+        self.moves = state.get_possible_moves()
+        self.priors = None if priors is None else priors(state, self.moves)
+        self.children = [None] * len(self.moves)
+        self.visits = [0] * len(self.moves)
+        self.values = [0.0] * len(self.moves)
+
+def team_value(state) -> float:
+    result = state.game_result()
+    return 1.0 if result > 0 else 0.0 if result < 0 else 0.5
+
+class MCTS:
+    def __init__(self, exploration=1.4, priors=None, rollout_depth=None, seed=None):
+        self.exploration = exploration
+        self.priors = priors
+        self.rollout_depth = rollout_depth
+        self.rng = random.Random(seed)
+        self.root = None
+
+    def select(self, node) -> int:
+        parent_visits = sum(node.visits)
+        log_visits = math.log(parent_visits + 1)
+        best_index = 0
+        best_score = -1.0
+        for index, visits in enumerate(node.visits):
+            if node.priors is None:
+                if visits == 0:
+                    return index
+                score = node.values[index] / visits + self.exploration * math.sqrt(log_visits / visits)
+            else:
+                value = node.values[index] / visits if visits != 0 else 0.5
+                score = value + self.exploration * node.priors[index] * math.sqrt(parent_visits + 1) / (1 + visits)
+            if score > best_score:
+                best_index = index
+                best_score = score
+        return best_index
+
+    def rollout(self, state) -> float:
+        actions = []
+        while not state.is_game_over() and (self.rollout_depth is None or len(actions) < self.rollout_depth):
+            action = Action.deserialize(self.rng.choice(state.get_possible_moves()))
+            state.do_action(action)
+            actions.append(action)
+        value = team_value(state)
+        for action in reversed(actions):
+            state.undo_action(action)
+        return value
+
+    def iterate(self, state):
+        node = self.root
+        path = []
+        actions = []
+        while True:
+            if state.is_game_over():
+                value = team_value(state)
+                break
+            if node is None:
+                path[-1][0].children[path[-1][1]] = Node(state, self.priors)
+                value = self.rollout(state)
+                break
+            index = self.select(node)
+            action = Action.deserialize(node.moves[index])
+            state.do_action(action)
+            path.append((node, index))
+            actions.append(action)
+            node = node.children[index]
+        for node, index in path:
+            node.visits[index] += 1
+            node.values[index] += value if node.color & 1 == 0 else 1.0 - value
+        for action in reversed(actions):
+            state.undo_action(action)
+
+    # Runs until the iteration or the time budget is used up, the state is restored afterwards
+    def search(self, state, iterations=None, time_limit=None) -> str:
+        assert iterations is not None or time_limit is not None
+        self.root = Node(state, self.priors)
+        deadline = None if time_limit is None else time.perf_counter() + time_limit
+        iteration = 0
+        while (iterations is None or iteration < iterations) and (deadline is None or time.perf_counter() < deadline):
+            self.iterate(state)
+            iteration += 1
+        return self.result()
+
+    def result(self) -> str:
+        root = self.root
+        best_index = max(range(len(root.moves)), key=lambda index: root.visits[index])
+        string = str(root.moves[best_index])
+        for move, visits, value in zip(root.moves, root.visits, root.values):
+            if visits != 0:
+                string += f" {move} {value / visits:.4f}"
+        total_visits = sum(root.visits)
+        root_value = sum(root.values) / total_visits if total_visits != 0 else 0.5
+        return string + f" {root_value:.4f}"
+
+# Uses the field scores of a NeuralNetwork as move priors
+class NetworkPriors:
+    def __init__(self, nn):
+        self.nn = nn
+
+    def __call__(self, state, moves) -> list:
+        if moves[0] == 0xFFFF:
+            return [1.0]
+        rotated = deepcopy(state)
+        rotation = Rotation.from_state(rotated)
+        rotation.rotate_state(rotated)
+        rotated_moves = rotated.get_possible_moves()
+        out = self.nn.model.predict_on_batch(state_to_input(rotated)[None])[0]
+        # Keyed on the packed move, like the moves in get_possible_moves. The corner symmetries are their own
+        # inverse, so the same table maps the rotated moves back.
+        moves_back = MOVE_TRANSFORMS[rotation.top_left_corner, rotated_moves].tolist()
+        scores = dict(zip(moves_back, score_moves(rotated_moves, out).tolist()))
+        priors = [scores.get(move, 0.0) for move in moves]
+        total = sum(priors)
+        if total <= 0:
+            return [1.0 / len(moves)] * len(moves)
+        return [prior / total for prior in priors]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fen")
+    parser.add_argument("--iterations", type=int)
+    parser.add_argument("--time", type=float, help="seconds per search")
+    parser.add_argument("--server", action="store_true", help="read \"<iterations> <fen>\" requests from stdin")
+    parser.add_argument("--checkpoint", help="use the network weights in this file as move priors")
+    parser.add_argument("--rollout-depth", type=int)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    priors = None
+    if args.checkpoint is not None:
+        from neural_network import NeuralNetwork
+        nn = NeuralNetwork()
+        nn.load_weights(args.checkpoint)
+        priors = NetworkPriors(nn)
+    mcts = MCTS(priors=priors, rollout_depth=args.rollout_depth, seed=args.seed)
+    if not args.server:
+        print("result " + mcts.search(GameState(args.fen), args.iterations, args.time), flush=True)
+        return
+    for line in sys.stdin:
+        iterations, fen = line.split(" ", 1)
+        print("result " + mcts.search(GameState(fen.strip()), int(iterations), args.time), flush=True)
+
+if __name__ == "__main__":
+    main()
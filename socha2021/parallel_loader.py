@@ -0,0 +1,86 @@
+import os
+import multiprocessing
+from collections import deque
+import numpy as np
+
+CHUNK_BYTES = 1 << 22
+
+def byte_ranges(path: str, chunk_bytes=CHUNK_BYTES) -> list:
+    size = os.path.getsize(path)
+    return [(start, min(start + chunk_bytes, size)) for start in range(0, size, chunk_bytes)]
+
+# Yields every line that starts inside [start, end), so adjacent ranges never split or repeat a line
+def read_lines(path: str, start: int, end: int):
+    with open(path, "rb") as file:
+        if start > 0:
+            file.seek(start - 1)
+            if file.read(1) != b"\n":
+                file.readline()
+        while file.tell() < end:
+            line = file.readline()
+            if not line:
+                break
+            yield line.decode("utf-8")
+
+def to_arrays(values: list, dtype) -> np.ndarray:
+    return np.array(values, dtype=dtype) if len(values) != 0 else np.zeros((0,), dtype=dtype)
+
+def parse_range(task: tuple) -> tuple:
+    path, start, end, parse_line, x_dtype, y_dtype = task
+    X = []
+    Y = []
+    lines = malformed = 0
+    for line in read_lines(path, start, end):
+        lines += 1
+        try:
+            examples = list(parse_line(line))
+        except Exception:
+            malformed += 1
+            continue
+        for x, y in examples:
+            X.append(x)
+            Y.append(y)
+    return to_arrays(X, x_dtype), to_arrays(Y, y_dtype), lines, malformed
+
+# parse_line(line) has to be a module level function that yields (x, y) pairs
+def parse_parallel(paths, parse_line, workers=None, chunk_bytes=CHUNK_BYTES, x_dtype=np.float32, y_dtype=np.float32):
+    tasks = [
+        (path, start, end, parse_line, x_dtype, y_dtype)
+        for path in paths
+        for start, end in byte_ranges(path, chunk_bytes)
+    ]
+    if workers == 0:
+        yield from map(parse_range, tasks)
+        return
+    # Only a few ranges per worker are scheduled ahead, so a consumer that stops early does not parse the rest.
+    # Spawned instead of forked, the callers may already have initialised TensorFlow.
+    window = 2 * (workers or os.cpu_count() or 1)
+    with multiprocessing.get_context("spawn").Pool(workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.apply_async(parse_range, (task,)))
+            if len(pending) >= window:
+                yield pending.popleft().get()
+        while len(pending) != 0:
+            yield pending.popleft().get()
+
+# Stops scheduling byte ranges once limit examples were parsed, the result has at most limit examples
+def load_parallel(paths, parse_line, workers=None, chunk_bytes=CHUNK_BYTES, x_dtype=np.float32, y_dtype=np.float32, limit=None) -> tuple:
+    for path in paths:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} does not exist")
+    X = []
+    Y = []
+    statistics = {"lines": 0, "examples": 0, "malformed": 0}
+    for x, y, lines, malformed in parse_parallel(paths, parse_line, workers, chunk_bytes, x_dtype, y_dtype):
+        statistics["lines"] += lines
+        statistics["examples"] += len(x)
+        statistics["malformed"] += malformed
+        if len(x) != 0:
+            X.append(x)
+            Y.append(y)
+        if limit is not None and statistics["examples"] >= limit:
+            break
+    if len(X) == 0:
+        return to_arrays([], x_dtype), to_arrays([], y_dtype), statistics
+    return np.concatenate(X)[:limit], np.concatenate(Y)[:limit], statistics
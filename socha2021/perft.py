@@ -0,0 +1,101 @@
+from blokus.gamestate import *
+import argparse
+import random
+import time
+import sys
+
+# Counts the leaf nodes of the move tree up to a fixed depth. Skipping counts as a move and finished
+# games count as leaves. perft.txt holds "<depth> <nodes> <fen>" lines that every move generator
+# change has to reproduce.
+REGRESSION_FILE = "perft.txt"
+
+def perft(state, depth: int) -> int:
+    if depth == 0 or state.is_game_over():
+        return 1
+    moves = state.get_possible_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        action = Action.deserialize(move)
+        state.do_action(action)
+        nodes += perft(state, depth - 1)
+        state.undo_action(action)
+    return nodes
+
+def divide(state, depth: int) -> dict:
+    assert depth >= 1
+    counts = {}
+    for move in state.get_possible_moves():
+        action = Action.deserialize(move)
+        state.do_action(action)
+        counts[move] = perft(state, depth - 1)
+        state.undo_action(action)
+    return counts
+
+def timed_perft(state, depth: int) -> tuple:
+    start = time.perf_counter()
+    nodes = perft(state, depth)
+    return nodes, time.perf_counter() - start
+
+def load_regression_file(path=REGRESSION_FILE) -> list:
+    entries = []
+    with open(path, "r") as file:
+        for line in file:
+            if line.strip() == "" or line.startswith("#"):
+                continue
+            depth, nodes, fen = line.split(" ", 2)
+            entries.append((int(depth), int(nodes), fen.strip()))
+    return entries
+
+def verify(path=REGRESSION_FILE) -> bool:
+    passed = True
+    total_nodes = 0
+    total_seconds = 0.0
+    for depth, expected, fen in load_regression_file(path):
+        nodes, seconds = timed_perft(GameState(fen), depth)
+        total_nodes += nodes
+        total_seconds += seconds
+        status = "ok" if nodes == expected else f"FAILED, expected {expected}"
+        print(f"perft({depth}) = {nodes} in {seconds:.2f}s ({nodes / seconds:.0f} nodes/s) {status}")
+        passed &= nodes == expected
+    print(f"{total_nodes} nodes in {total_seconds:.2f}s ({total_nodes / total_seconds:.0f} nodes/s)")
+    return passed
+
+def write_regression_file(path=REGRESSION_FILE, seed=2021):
+    # Fixed positions from seeded random games, the depths keep every entry at a few seconds
+    random.seed(seed)
+    positions = [(0, 4), (3, 3), (8, 2), (20, 2), (40, 3), (48, 3)]
+    with open(path, "w") as file:
+        file.write("# <depth> <nodes> <fen>\n")
+        for ply, depth in positions:
+            state = GameState.random(ply)
+            while state.is_game_over() or state.get_possible_moves()[0] == 0xFFFF:
+                state = GameState.random(ply)
+            file.write(f"{depth} {perft(state, depth)} {state.to_fen()}\n")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("depth", type=int, nargs="?")
+    parser.add_argument("--fen", help="position to count, the start position if not given")
+    parser.add_argument("--divide", action="store_true", help="print the count below every root move")
+    parser.add_argument("--verify", action="store_true", help="check the counts in the regression file")
+    parser.add_argument("--write", action="store_true", help="regenerate the regression file")
+    parser.add_argument("--file", default=REGRESSION_FILE)
+    args = parser.parse_args()
+    if args.write:
+        write_regression_file(args.file)
+    if args.verify:
+        sys.exit(0 if verify(args.file) else 1)
+    if args.depth is not None:
+        state = GameState(args.fen)
+        start = time.perf_counter()
+        if args.divide:
+            counts = divide(state, args.depth)
+            for move, nodes in counts.items():
+                print(f"{move} {Action.deserialize(move)}: {nodes}")
+            nodes = sum(counts.values())
+        else:
+            nodes = perft(state, args.depth)
+        seconds = time.perf_counter() - start
+        print(f"perft({args.depth}) = {nodes} in {seconds:.2f}s ({nodes / seconds:.0f} nodes/s)")
@@ -0,0 +1,158 @@
+import os
+import queue
+import threading
+import multiprocessing
+from collections import deque
+import numpy as np
+from encoding import *
+from shards import read_index
+
+def decode_lines(lines: list) -> tuple:
+    X = []
+    Y = []
+    for line in lines:
+        try:
+            x, y = to_example(line)
+        except Exception:
+            continue
+        if x is not None:
+            X.append(x)
+            Y.append(y)
+    return np.array(X, dtype=np.uint8).reshape(-1, *INPUT_SHAPE), np.array(Y, dtype=np.float16).reshape(-1, 400)
+
+def decode_shard_slice(x_path: str, y_path: str, start: int, end: int) -> tuple:
+    return np.array(np.load(x_path, mmap_mode="r")[start:end]), np.array(np.load(y_path, mmap_mode="r")[start:end])
+
+def decode_task(task: tuple) -> tuple:
+    if task[0] == "lines":
+        return decode_lines(task[1])
+    return decode_shard_slice(*task[1:])
+
+# Streams shuffled (X, Y) batches from text datasets and/or directories written by shards.py.
+# Only a bounded number of chunks is decoded ahead and at most shuffle_buffer examples are held,
+# so memory use does not grow with the size of the corpus.
+class ExampleStream:
+    def __init__(self, sources, batch_size=256, shuffle_buffer=8192, chunk_size=512, workers=None, prefetch=8, seed=None):
+        for source in sources:
+            if not os.path.exists(source):
+                raise FileNotFoundError(f"{source} does not exist")
+        self.sources = list(sources)
+        self.batch_size = batch_size
+        self.shuffle_buffer = max(shuffle_buffer, batch_size)
+        self.chunk_size = chunk_size
+        # Every spawned worker is a separate interpreter, a few are enough to keep up with the training
+        self.workers = min(4, os.cpu_count()) if workers is None else workers
+        self.prefetch = prefetch
+        self.rng = np.random.default_rng(seed)
+
+    def tasks(self):
+        slices = []
+        for source in self.sources:
+            if not os.path.isdir(source):
+                continue
+            index = read_index(source)
+            for shard in index["shards"]:
+                for start in range(0, shard["examples"], self.chunk_size):
+                    end = min(start + self.chunk_size, shard["examples"])
+                    slices.append(("shard", os.path.join(source, shard["x"]), os.path.join(source, shard["y"]), start, end))
+        for i in self.rng.permutation(len(slices)):
+            yield slices[i]
+        for source in self.sources:
+            if os.path.isdir(source):
+                continue
+            with open(source, "r") as file:
+                lines = []
+                for line in file:
+                    lines.append(line)
+                    if len(lines) == self.chunk_size:
+                        yield ("lines", lines)
+                        lines = []
+                if len(lines) != 0:
+                    yield ("lines", lines)
+
+    def chunks(self):
+        if self.workers == 0 or all(os.path.isdir(source) for source in self.sources):
+            for task in self.tasks():
+                yield decode_task(task)
+            return
+        # The pool is created from the prefetch thread after TensorFlow was initialised, forking that process
+        # is not safe. Shard slices are only copied from memory mapped files, so they are read in this thread.
+        with multiprocessing.get_context("spawn").Pool(self.workers) as pool:
+            pending = deque()
+            for task in self.tasks():
+                if task[0] == "shard":
+                    pending.append(decode_task(task))
+                else:
+                    pending.append(pool.apply_async(decode_task, (task,)))
+                if len(pending) >= 2 * self.workers:
+                    yield self.result(pending.popleft())
+            while len(pending) != 0:
+                yield self.result(pending.popleft())
+
+    def result(self, chunk) -> tuple:
+        return chunk if isinstance(chunk, tuple) else chunk.get()
+
+    def batches(self):
+        capacity = self.shuffle_buffer + self.chunk_size
+        buffer_x = np.empty((capacity, *INPUT_SHAPE), dtype=np.uint8)
+        buffer_y = np.empty((capacity, 400), dtype=np.float16)
+        size = 0
+        for x, y in self.chunks():
+            while size + len(x) > capacity:
+                size = yield from self.take_batches(buffer_x, buffer_y, size, size + len(x) - capacity)
+            buffer_x[size:size + len(x)] = x
+            buffer_y[size:size + len(y)] = y
+            size += len(x)
+        yield from self.take_batches(buffer_x, buffer_y, size, size)
+
+    def take_batches(self, buffer_x, buffer_y, size: int, n: int):
+        # Draws random examples and fills the holes with the examples from the end of the buffer
+        while n > 0 and size > 0:
+            batch_size = min(self.batch_size, size)
+            indices = self.rng.choice(size, batch_size, replace=False)
+            yield buffer_x[indices].astype(np.float32), buffer_y[indices].astype(np.float32)
+            tail = np.arange(size - batch_size, size)
+            holes = indices[indices < size - batch_size]
+            buffer_x[holes] = buffer_x[np.setdiff1d(tail, indices)]
+            buffer_y[holes] = buffer_y[np.setdiff1d(tail, indices)]
+            size -= batch_size
+            n -= batch_size
+        return size
+
+    def __iter__(self):
+        if self.prefetch == 0:
+            yield from self.batches()
+            return
+        batches = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+
+        def produce():
+            generator = self.batches()
+            try:
+                for batch in generator:
+                    if stop.is_set():
+                        return
+                    batches.put(batch)
+                batches.put(None)
+            except BaseException as e:
+                batches.put(e)
+            finally:
+                generator.close()
+
+        thread = threading.Thread(target=produce, daemon=True)
+        thread.start()
+        try:
+            while True:
+                batch = batches.get()
+                if batch is None:
+                    return
+                if isinstance(batch, BaseException):
+                    raise batch
+                yield batch
+        finally:
+            stop.set()
+            while thread.is_alive():
+                try:
+                    batches.get_nowait()
+                except queue.Empty:
+                    thread.join(0.01)
@@ -0,0 +1,231 @@
+import os
+import sys
+import mmap
+import struct
+from array import array
+from blokus.gamestate import *
+
+# Binary dataset files start with MAGIC, followed by records of a fixed size header and a variable
+# length tail. The header holds the low 17 bits of the FEN data field (monomino flags, start piece
+# type and ply), the skipped history, the placed pieces, the four 420 bit boards and the number of
+# (action, value) pairs. The tail holds the packed actions as uint16 followed by the values as float32.
+# "<file>.idx" stores the uint64 offset of every record for random access.
+MAGIC = b"SOCHA21\x01"
+HEADER = struct.Struct("<I16s11s212sH")
+OFFSET = struct.Struct("<Q")
+
+def _little_endian(values: array) -> array:
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+def encode_record(data: int, pieces: int, boards: list, moves, values) -> bytes:
+    skipped = data >> 17
+    if skipped >> 128 != 0:
+        raise ValueError("the skipped history does not fit into a binary record")
+    header = HEADER.pack(
+        data & 0x1FFFF,
+        skipped.to_bytes(16, "little"),
+        pieces.to_bytes(11, "little"),
+        b"".join(board.to_bytes(53, "little") for board in boards),
+        len(moves),
+    )
+    return header + _little_endian(array("H", moves)).tobytes() + _little_endian(array("f", values)).tobytes()
+
+def decode_record(buffer, offset: int) -> tuple:
+    info, skipped, pieces, boards, n = HEADER.unpack_from(buffer, offset)
+    offset += HEADER.size
+    moves = array("H")
+    moves.frombytes(buffer[offset:offset + 2 * n])
+    offset += 2 * n
+    values = array("f")
+    values.frombytes(buffer[offset:offset + 4 * n])
+    data = info | int.from_bytes(skipped, "little") << 17
+    boards = [int.from_bytes(boards[i * 53:(i + 1) * 53], "little") for i in range(4)]
+    return data, int.from_bytes(pieces, "little"), boards, _little_endian(moves), _little_endian(values)
+
+def record_size(buffer, offset: int) -> int:
+    return HEADER.size + 6 * HEADER.unpack_from(buffer, offset)[4]
+
+# Offsets of all records, found by walking the record headers
+def record_offsets(buffer) -> array:
+    offsets = array("Q")
+    offset = len(MAGIC)
+    while offset < len(buffer):
+        offsets.append(offset)
+        offset += record_size(buffer, offset)
+    return offsets
+
+def read_offsets(index_path: str) -> array:
+    offsets = array("Q")
+    with open(index_path, "rb") as index_file:
+        offsets.frombytes(index_file.read())
+    return _little_endian(offsets)
+
+def index_is_valid(buffer, index_path: str) -> bool:
+    # Only reads the first and the last offset, walking the records would cost as much as rebuilding the index.
+    # The first record has to start after MAGIC and the last one has to end at the end of the file.
+    if not os.path.exists(index_path):
+        return False
+    with open(index_path, "rb") as index_file:
+        size = index_file.seek(0, os.SEEK_END)
+        if size % OFFSET.size != 0:
+            return False
+        if size == 0:
+            return len(buffer) == len(MAGIC)
+        index_file.seek(0)
+        first = OFFSET.unpack(index_file.read(OFFSET.size))[0]
+        index_file.seek(size - OFFSET.size)
+        last = OFFSET.unpack(index_file.read(OFFSET.size))[0]
+    if first != len(MAGIC) or last + HEADER.size > len(buffer):
+        return False
+    return last + record_size(buffer, last) == len(buffer)
+
+def map_dataset(path: str) -> mmap.mmap:
+    with open(path, "rb") as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[:len(MAGIC)] != MAGIC:
+        buffer.close()
+        raise ValueError(f"{path} is not a binary dataset")
+    return buffer
+
+def parse_line(line: str) -> tuple:
+    entries = line.split()
+    tokens = fen_tokens(entries)
+    assert len(entries) >= tokens and (len(entries) - tokens) % 2 == 0
+    data, pieces, boards = parse_fen(line)
+    moves = [int(float(entry)) for entry in entries[tokens::2]]
+    values = [float(entry) for entry in entries[tokens + 1::2]]
+    return data, pieces, boards, moves, values
+
+def format_value(value: float) -> str:
+    # Shortest representation that reads back as the same float32
+    packed = struct.pack("<f", value)
+    for precision in range(1, 10):
+        string = f"{value:.{precision}g}"
+        if struct.pack("<f", float(string)) == packed:
+            return string
+    return repr(value)
+
+def format_line(data: int, pieces: int, boards: list, moves, values) -> str:
+    string = format_fen(data, pieces, boards)
+    for move, value in zip(moves, values):
+        string += f" {move} {format_value(value)}"
+    return string
+
+class RecordWriter:
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.exists(path) and os.path.getsize(path) != 0:
+            self.repair_index()
+        self.file = open(path, "ab")
+        self.file.seek(0, os.SEEK_END)
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        self.index_file = open(path + ".idx", "ab")
+        self.records = 0
+
+    def repair_index(self):
+        # Appending to a missing or stale index would leave it without the existing records
+        buffer = map_dataset(self.path)
+        try:
+            if not index_is_valid(buffer, self.path + ".idx"):
+                with open(self.path + ".idx", "wb") as index_file:
+                    index_file.write(_little_endian(record_offsets(buffer)).tobytes())
+        finally:
+            buffer.close()
+
+    def write_record(self, data: int, pieces: int, boards: list, moves, values):
+        assert len(moves) == len(values)
+        offset = self.file.tell()
+        self.file.write(encode_record(data, pieces, boards, moves, values))
+        self.index_file.write(OFFSET.pack(offset))
+        self.records += 1
+
+    def write(self, state, moves, values):
+        data, pieces, boards = state.get_position()
+        self.write_record(data, pieces, boards, moves, values)
+
+    def write_line(self, line: str):
+        self.write_record(*parse_line(line))
+
+    def flush(self):
+        self.file.flush()
+        self.index_file.flush()
+
+    def close(self):
+        self.file.close()
+        self.index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class RecordReader:
+    def __init__(self, path: str):
+        self.path = path
+        self.buffer = map_dataset(path)
+        self.offsets = self.load_index()
+
+    def load_index(self) -> array:
+        if index_is_valid(self.buffer, self.path + ".idx"):
+            return read_offsets(self.path + ".idx")
+        # The index is missing or stale, rebuild it by walking the record headers
+        return record_offsets(self.buffer)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, index: int) -> tuple:
+        return decode_record(self.buffer, self.offsets[index])
+
+    def __iter__(self):
+        for offset in self.offsets:
+            yield decode_record(self.buffer, offset)
+
+    def state(self, index: int) -> GameState:
+        data, pieces, boards, _, _ = self[index]
+        state = GameState()
+        state.load_position(data, pieces, boards)
+        return state
+
+    def line(self, index: int) -> str:
+        return format_line(*self[index])
+
+    def close(self):
+        self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def text_to_binary(source: str, destination: str) -> int:
+    malformed = 0
+    with open(source, "r") as file, RecordWriter(destination) as writer:
+        for line in file:
+            try:
+                record = parse_line(line)
+            except (AssertionError, ValueError):
+                malformed += 1
+                continue
+            writer.write_record(*record)
+    return malformed
+
+def binary_to_text(source: str, destination: str):
+    with RecordReader(source) as reader, open(destination, "w") as file:
+        for record in reader:
+            file.write(format_line(*record) + "\n")
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] not in ["to-binary", "to-text"]:
+        print("usage: records.py to-binary|to-text <source> <destination>")
+        sys.exit(1)
+    if sys.argv[1] == "to-binary":
+        malformed = text_to_binary(sys.argv[2], sys.argv[3])
+        print(f"{malformed} malformed lines skipped")
+    else:
+        binary_to_text(sys.argv[2], sys.argv[3])
@@ -0,0 +1,98 @@
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+from encoding import *
+from parallel_loader import parse_parallel
+
+# Preprocessed datasets are stored as shards of uint8 inputs (N, 20, 20, 5) and float16 targets (N, 400)
+# in "<cache_directory>/<dataset name>-<sha256 prefix>-v<format version>/", described by an index.json.
+CACHE_DIRECTORY = "datasets/cache"
+SHARD_SIZE = 16384
+# Has to be increased whenever the encoding or the shard layout changes, so that old caches are rebuilt
+FORMAT_VERSION = 1
+
+def file_hash(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def shard_directory(path: str, cache_directory=CACHE_DIRECTORY) -> str:
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_directory, f"{name}-{file_hash(path)[:16]}-v{FORMAT_VERSION}")
+
+def read_index(directory: str) -> dict:
+    with open(os.path.join(directory, "index.json"), "r") as index_file:
+        index = json.load(index_file)
+    if index.get("version") != FORMAT_VERSION:
+        raise ValueError(f"{directory} has format version {index.get('version')}, expected {FORMAT_VERSION}")
+    return index
+
+def is_preprocessed(directory: str) -> bool:
+    try:
+        read_index(directory)
+    except (FileNotFoundError, ValueError):
+        return False
+    return True
+
+def write_shard(directory: str, index: int, X: np.ndarray, Y: np.ndarray) -> dict:
+    shard = {"x": f"x_{index:05}.npy", "y": f"y_{index:05}.npy", "examples": len(X)}
+    np.save(os.path.join(directory, shard["x"]), X.astype(np.uint8))
+    np.save(os.path.join(directory, shard["y"]), Y.astype(np.float16))
+    return shard
+
+def preprocess_dataset(path: str, cache_directory=CACHE_DIRECTORY, shard_size=SHARD_SIZE, workers=None) -> str:
+    directory = shard_directory(path, cache_directory)
+    if is_preprocessed(directory):
+        return directory
+    print(f"preprocessing {path} into {directory}")
+    temporary_directory = directory + ".tmp"
+    shutil.rmtree(temporary_directory, ignore_errors=True)
+    os.makedirs(temporary_directory)
+    shards = []
+    X = np.zeros((0, *INPUT_SHAPE), dtype=np.uint8)
+    Y = np.zeros((0, 400), dtype=np.float16)
+    skipped = errors = 0
+    for x, y, lines, malformed in parse_parallel([path], to_examples, workers, x_dtype=np.uint8, y_dtype=np.float16):
+        skipped += lines - malformed - len(x)
+        errors += malformed
+        if len(x) != 0:
+            X = np.concatenate([X, x])
+            Y = np.concatenate([Y, y])
+        while len(X) >= shard_size:
+            shards.append(write_shard(temporary_directory, len(shards), X[:shard_size], Y[:shard_size]))
+            X, Y = X[shard_size:], Y[shard_size:]
+    if len(X) != 0:
+        shards.append(write_shard(temporary_directory, len(shards), X, Y))
+    index = {
+        "version": FORMAT_VERSION,
+        "source": path,
+        "examples": sum(shard["examples"] for shard in shards),
+        "skipped": skipped,
+        "errors": errors,
+        "shards": shards,
+    }
+    with open(os.path.join(temporary_directory, "index.json"), "w") as index_file:
+        json.dump(index, index_file, indent=4)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(temporary_directory, directory)
+    print(f"{index['examples']} examples in {len(shards)} shards, {skipped} skipped, {errors} errors")
+    return directory
+
+def load_shards(directory: str) -> list:
+    index = read_index(directory)
+    return [
+        (
+            np.load(os.path.join(directory, shard["x"]), mmap_mode="r"),
+            np.load(os.path.join(directory, shard["y"]), mmap_mode="r"),
+        )
+        for shard in index["shards"]
+    ]
+
+if __name__ == "__main__":
+    import sys
+    for dataset_path in sys.argv[1:]:
+        preprocess_dataset(dataset_path)
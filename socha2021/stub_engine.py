@@ -0,0 +1,38 @@
+from blokus.gamestate import *
+import argparse
+import random
+import time
+import sys
+
+# Stand-in for dataset.exe that speaks the same protocol with random values. It answers a single
+# position given with --fen, or, with --server, one "<iterations> <fen>" request per stdin line.
+# Every answer ends with "result <best action> <action> <value> ... <root value>".
+
+def search(fen, iterations, delay):
+    state = GameState(fen)
+    print(f"searching {iterations} iterations")
+    time.sleep(delay)
+    pairs = [(move, random.random()) for move in state.get_possible_moves()]
+    best_move = max(pairs, key=lambda pair: pair[1])[0]
+    entries = " ".join(f"{move} {value:.4f}" for move, value in pairs)
+    return f"result {best_move} {entries} {random.random():.4f}"
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fen")
+    parser.add_argument("--iterations", type=int, default=0)
+    parser.add_argument("--server", action="store_true")
+    parser.add_argument("--delay", type=float, default=0.0)
+    parser.add_argument("--crash-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    if not args.server:
+        print(search(args.fen, args.iterations, args.delay), flush=True)
+        return
+    for line in sys.stdin:
+        if random.random() < args.crash_rate:
+            sys.exit(1)
+        iterations, fen = line.split(" ", 1)
+        print(search(fen.strip(), int(iterations), args.delay), flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,76 @@
 from neural_network import *
+from blokus.profiler import enable_from_environment
 from random import choice
+import sys
+import time
 import os
 
-checkpoint = max([int(filename) for filename in os.listdir("checkpoints")])
+def covered_fields(state):
+    return (state.board[0] | state.board[2]).count_ones()
 
-nn = NeuralNetwork()
-nn.load_weights(f"checkpoints/{checkpoint}")
-
-sum_results = 0
-played_games = 0
-while True:
+def play_game(nn, verbose=False):
     state = GameState()
     while not state.is_game_over():
         if state.ply % 2 == 0:
             action, conf = nn.pick_action(state)
-            print(action, conf)
+            if verbose:
+                print(action, conf)
             state.do_action(action)
         else:
             state.do_action(choice(state.get_possible_actions()))
-        print(state)
-        #input()
-    #result = state.game_result()
-    played_games += 1
-    sum_results += (state.board[0] | state.board[2]).count_ones()
-    print(sum_results / played_games)
+        if verbose:
+            print(state)
+    return state
+
+# Plays n games in lockstep so the network evaluates all of them in one batch per ply
+def play_games(nn, n):
+    states = [GameState() for _ in range(n)]
+    while True:
+        running = [state for state in states if not state.is_game_over()]
+        if len(running) == 0:
+            return states
+        nn_states = [state for state in running if state.ply % 2 == 0]
+        for state, (action, conf) in zip(nn_states, nn.pick_actions(nn_states)):
+            state.do_action(action)
+        for state in running:
+            # The network move may have just ended the game
+            if state.ply % 2 == 1 and not state.is_game_over():
+                state.do_action(choice(state.get_possible_actions()))
+
+def compare(nn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        play_game(nn)
+    sequential = time.perf_counter() - start
+    start = time.perf_counter()
+    play_games(nn, n)
+    batched = time.perf_counter() - start
+    print(f"sequential: {n / sequential:.3f} games/s, batched: {n / batched:.3f} games/s ({sequential / batched:.2f}x)")
+
+if __name__ == "__main__":
+    GameState.move_cache = MoveCache(1024)
+    enable_from_environment()
+
+    checkpoint = max([int(filename) for filename in os.listdir("checkpoints") if filename.isdigit()])
+
+    nn = NeuralNetwork()
+    nn.load_weights(f"checkpoints/{checkpoint}")
+
+    parallel_games = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    if len(sys.argv) > 2 and sys.argv[2] == "compare":
+        compare(nn, parallel_games)
+        sys.exit()
+
+    sum_results = 0
+    played_games = 0
+    while True:
+        start = time.perf_counter()
+        if parallel_games == 1:
+            states = [play_game(nn, verbose=True)]
+        else:
+            states = play_games(nn, parallel_games)
+        elapsed = time.perf_counter() - start
+        played_games += len(states)
+        sum_results += sum(covered_fields(state) for state in states)
+        print(sum_results / played_games, f"{len(states) / elapsed:.3f} games/s")
+        print(GameState.move_cache)
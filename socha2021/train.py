@@ -0,0 +1,30 @@
+import os
+from shards import preprocess_dataset
+from pipeline import ExampleStream
+from blokus.profiler import enable_from_environment
+
+# Training entry point. TensorFlow is only imported after the shards are written, so the worker processes
+# that are spawned for parsing and decoding import this module without loading TensorFlow.
+
+def main():
+    stream = ExampleStream(
+        [
+            preprocess_dataset("datasets/test_dataset.txt"),
+            preprocess_dataset("datasets/dataset_0.txt"),
+        ]
+    )
+    from neural_network import NeuralNetwork
+    enable_from_environment()
+    nn = NeuralNetwork()
+    checkpoint = 0
+
+    #checkpoint = max([int(filename) for filename in os.listdir("checkpoints") if filename.isdigit()])
+    #nn.load_weights(f"checkpoints/{checkpoint}")
+
+    while True:
+        nn.train(stream, epochs=25)
+        nn.save_weights(f"checkpoints/{checkpoint}")
+        checkpoint += 1
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Dense
 import numpy as np
+from parallel_loader import load_parallel
 
 L0_SIZE = 13
 L1_SIZE = 1
@@ -41,21 +42,10 @@ class Tuning:
                 print(l)
             print()
 
-def load_dataset(path):
-    X = []
-    Y = []
-    with open(path, "r") as dataset_file:
-        for i, line in enumerate(dataset_file):
-            print(i)
-            try:
-                for x, y in line_to_examples(line):
-                    X.append(x)
-                    Y.append(y)
-            except KeyboardInterrupt:
-                break
-            except:
-                print(line)
-    return np.array(X), np.array(Y)
+def load_dataset(path, workers=None):
+    X, Y, statistics = load_parallel([path], line_to_examples, workers)
+    print(f"{statistics['examples']} examples from {statistics['lines']} lines, {statistics['malformed']} malformed")
+    return X, Y
 
 def line_to_examples(line):
     state = GameState(line)
@@ -65,15 +55,10 @@ def line_to_examples(line):
     second_color = (current_color + 2) & 0b11
     last_opponent_color = (current_color + 3) & 0b11
     occupied = state.get_occupied_fields()
-    placement_fields = []
-    for color in range(4):
-        current_color_fields = state.board[color]
-        other_colors_fields = occupied & ~current_color_fields
-        legal_fields = ~(occupied | current_color_fields.neighbours()) & VALID_FIELDS
-        placement_fields.append(current_color_fields.diagonal_neighbours() & legal_fields if state.ply > 3 else START_FIELDS & ~other_colors_fields)
+    placement_fields = [state.get_placement_fields(color) for color in range(4)]
     reachable_fields = []
     for color in range(4):
-        reachable = placement_fields[color]
+        reachable = placement_fields[color].clone()
         unreachable = state.board[color].neighbours() | occupied
         for _ in range(4):
             reachable |= reachable.neighbours() & ~unreachable
@@ -85,7 +70,8 @@ def line_to_examples(line):
     opponent_reachable_fields = reachable_fields[next_opponent_color] | reachable_fields[last_opponent_color]
     k = reachable_fields[current_color] & (occupied & ~state.board[current_color]).neighbours() & ~(occupied & ~state.board[current_color]).diagonal_neighbours()
 
-    entries = line.split()[18:]
+    entries = line.split()
+    entries = entries[fen_tokens(entries):]
     assert len(entries) % 2 == 0
     max_value = 0
     min_value = 1
@@ -132,8 +118,9 @@ def line_to_examples(line):
         ], dtype=np.float32)
         yield inp, value
 
-X, Y = load_dataset("datasets/dataset_0.txt")
-print(X.shape, Y.shape)
-t = Tuning()
-t.train(X, Y, 20)
-t.print_weights()
+if __name__ == "__main__":
+    X, Y = load_dataset("datasets/dataset_0.txt")
+    print(X.shape, Y.shape)
+    t = Tuning()
+    t.train(X, Y, 20)
+    t.print_weights()